@@ -1,11 +1,6 @@
-import re
-from io import BytesIO
-
 import streamlit as st
-from PIL import Image
-from pyzbar.pyzbar import decode
-import numpy as np
-import easyocr
+
+from vin_recognition import CASCADE_STAGES, STAGE_STATS, RecognizerBusy, prewarm_ocr, resolve_vin, submit_vin_recognition
 
 # Try to import the live camera component. The app still works if it's missing.
 try:
@@ -14,43 +9,71 @@ try:
 except Exception:
     HAS_LIVE = False
 
-VIN_PATTERN = re.compile(r"^[A-HJ-NPR-Z0-9]{17}$")
-
-
-def decode_barcode(image: Image.Image) -> str | None:
-    """Return a VIN from a barcode if found."""
-    for barcode in decode(image):
-        value = barcode.data.decode("utf-8").strip().upper()
-        if VIN_PATTERN.match(value):
-            return value
-    return None
+POLL_INTERVAL = 0.5  # seconds between checks for a finished decode
+OCR_ENGINE = "easyocr"
 
 
-@st.cache_resource
-def get_ocr_reader():
-    """Load the EasyOCR reader only once."""
-    return easyocr.Reader(["en"], gpu=False)
+def wait_for_decode(vin_future) -> None:
+    """Show that a decode is running and rerun the page when it finishes."""
+    if vin_future.done():
+        st.rerun()
+    st.info("Reading VIN...")
 
 
-def ocr_vin(image: Image.Image) -> str | None:
-    """Extract a VIN from text in the image using OCR."""
-    reader = get_ocr_reader()
-    result = reader.readtext(np.array(image))
-    for _, text, _ in result:
-        candidate = text.upper().strip().replace(" ", "").replace("-", "")
-        if VIN_PATTERN.match(candidate):
-            return candidate
-    return None
-
-
-def process_image(image: Image.Image, method: str) -> None:
-    """Decode VIN from the image using the selected method."""
-    vin = decode_barcode(image) if method == "Barcode" else ocr_vin(image)
-    if vin:
-        st.success(f"Detected VIN: {vin}")
-        st.session_state.vin = vin
-    else:
+def show_vin(vin: str | None) -> None:
+    """Put a detected VIN in the text box, rerunning so the widget picks it up."""
+    if not vin:
         st.warning("No valid VIN detected. Try again.")
+        return
+    vin = resolve_vin(vin) or vin
+    st.success(f"Detected VIN: {vin}")
+    if vin != st.session_state.get("vin"):
+        st.session_state.pending_vin = vin
+        st.rerun()
+
+
+def process_image(data: bytes) -> None:
+    """Decode a VIN from an encoded snapshot in the background."""
+    try:
+        vin_future = submit_vin_recognition(data, OCR_ENGINE)
+    except RecognizerBusy:
+        st.warning("The VIN reader is busy. Try again in a moment.")
+        return
+    if not vin_future.done():
+        st.fragment(wait_for_decode, run_every=POLL_INTERVAL)(vin_future)
+        return
+    show_vin(vin_future.result())
+
+
+def process_frame(frame: bytes) -> None:
+    """Decode live camera frames, skipping frames while a decode is in flight."""
+    vin_future = st.session_state.get("frame_future")
+    if vin_future is not None:
+        if not vin_future.done():
+            return
+        del st.session_state.frame_future
+        vin = vin_future.result()
+        if vin:
+            show_vin(vin)
+            return
+    try:
+        st.session_state.frame_future = submit_vin_recognition(frame, OCR_ENGINE)
+    except RecognizerBusy:
+        pass
+
+
+def render_stage_stats() -> None:
+    stats = STAGE_STATS.info()
+    if not stats:
+        return
+    with st.expander("Decoder timings"):
+        for stage in CASCADE_STAGES:
+            if stage in stats:
+                totals = stats[stage]
+                st.write(
+                    f"**{stage}**: {totals['calls']} runs, {totals['hits']} hits, "
+                    f"{totals['mean_ms']:.0f} ms average"
+                )
 
 
 def main() -> None:
@@ -58,32 +81,29 @@ def main() -> None:
     st.write(
         "Scan a Vehicle Identification Number directly from your phone's camera."
     )
-
-    method = st.radio("Detection method", ["Barcode", "OCR"], horizontal=True)
+    prewarm_ocr(OCR_ENGINE)
 
     live_label = (
         "Real-Time" if HAS_LIVE else "Real-Time (install streamlit-camera-input-live)"
     )
     mode = st.radio("Camera mode", ["Snapshot", live_label], horizontal=True)
 
+    if "pending_vin" in st.session_state:
+        st.session_state.vin = st.session_state.pop("pending_vin")
     st.text_input("Detected VIN", key="vin")
     if st.button("Reset"):
-        st.session_state.vin = ""
-        st.experimental_rerun()
+        st.session_state.pending_vin = ""
+        st.rerun()
 
     if mode == "Snapshot" or not HAS_LIVE:
         picture = st.camera_input("Take a photo of the VIN")
         if picture:
-            image = Image.open(picture)
-            process_image(image, method)
+            process_image(picture.getvalue())
     else:
         frame = camera_input_live()
         if frame:
-            image = Image.open(BytesIO(frame))
-            vin = decode_barcode(image) if method == "Barcode" else ocr_vin(image)
-            if vin:
-                st.session_state.vin = vin
-                st.experimental_rerun()
+            process_frame(frame.getvalue() if hasattr(frame, "getvalue") else frame)
+    render_stage_stats()
 
 
 if __name__ == "__main__":
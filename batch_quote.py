@@ -0,0 +1,222 @@
+"""Headless whole-inventory lease pricing.
+
+Prices every VIN in the locator inventory across credit tiers, terms,
+mileages and counties and streams the results to CSV or Parquet:
+
+    python batch_quote.py --output quotes.csv
+    python batch_quote.py --output quotes.parquet --counties Marion,Franklin --lowest
+"""
+import argparse
+import os
+import sys
+from multiprocessing import Pool
+from typing import Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from data_loader import build_program_index, lookup_programs, read_sources, vin_model_year
+from quote_grid import TIER_COUNT, build_quote_grid
+
+OUTPUT_COLUMNS = [
+    "VIN", "ModelNumber", "Model", "Trim", "MSRP", "ProgramYear", "County", "TaxRate",
+    "Tier", "Markup", "Term", "Mileage", "Residual", "MoneyFactor", "LeaseCash",
+    "BasePayment", "MonthlyPayment",
+]
+DEFAULT_CHUNK_SIZE = 8  # vehicles per written chunk
+
+# Per-process state set up by _init_worker so each worker reads the data once.
+_worker = {}
+
+
+def _init_worker(counties: Optional[Sequence[str]], tiers: Sequence[int], markups: Sequence[bool],
+                 trade_value: float, cash_down: float, lowest: bool) -> None:
+    lease_programs, _, county_tax_rates = read_sources()
+    if counties:
+        county_tax_rates = county_tax_rates[county_tax_rates["County"].isin(counties)]
+    _worker.update(
+        program_index=build_program_index(lease_programs),
+        counties=list(zip(county_tax_rates["County"], county_tax_rates["Tax Rate"] / 100.0)),
+        tiers=list(tiers),
+        markups=list(markups),
+        trade_value=trade_value,
+        cash_down=cash_down,
+        lowest=lowest,
+    )
+
+
+def price_vehicle(vehicle: dict) -> pd.DataFrame:
+    """Return every quote for one inventory vehicle using the worker settings."""
+    programs = lookup_programs(_worker["program_index"], vehicle["ModelNumber"], vin_model_year(vehicle["VIN"]))
+    msrp = vehicle["MSRP"]
+    if not programs or pd.isna(msrp):
+        return pd.DataFrame(columns=OUTPUT_COLUMNS)
+
+    tier_index = np.array(_worker["tiers"]) - 1
+    markup_index = np.array(_worker["markups"], dtype=int)
+    frames = []
+    for county, tax_rate in _worker["counties"]:
+        grid = build_quote_grid(
+            programs, float(msrp), tax_rate,
+            trade_value=_worker["trade_value"], cash_down=_worker["cash_down"],
+        )
+        # Select the requested markups and tiers, then flatten (markup, tier, term, mileage).
+        money_factor = grid.money_factor[np.ix_(markup_index, tier_index)]
+        base_payment = grid.base_payment[np.ix_(markup_index, tier_index)]
+        payment = grid.payment[np.ix_(markup_index, tier_index)]
+        shape = payment.shape
+        mk, tr, te, mi = np.indices(shape).reshape(4, -1)
+        frame = pd.DataFrame({
+            "Tier": tier_index[tr] + 1,
+            "Markup": markup_index[mk].astype(bool),
+            "Term": np.array(grid.terms)[te],
+            "Mileage": np.array(grid.mileages)[mi],
+            "Residual": grid.residual_value[te, mi],
+            "MoneyFactor": money_factor[mk, tr, te],
+            "LeaseCash": grid.lease_cash[te],
+            "BasePayment": base_payment.ravel(),
+            "MonthlyPayment": payment.ravel(),
+        })
+        frame = frame[frame["MoneyFactor"].notna()]
+        if _worker["lowest"]:
+            frame = frame.loc[frame.groupby(["Tier", "Markup"])["MonthlyPayment"].idxmin()]
+        frame.insert(0, "TaxRate", tax_rate)
+        frame.insert(0, "County", county)
+        frames.append(frame)
+
+    result = pd.concat(frames, ignore_index=True)
+    result.insert(0, "ProgramYear", next(iter(programs.values())).year)
+    result.insert(0, "MSRP", float(msrp))
+    for column in ("Trim", "Model", "ModelNumber", "VIN"):
+        result.insert(0, column, vehicle.get(column))
+    return result[OUTPUT_COLUMNS]
+
+
+def check_selection(county_tax_rates: pd.DataFrame, counties: Optional[Sequence[str]], tiers: Sequence[int]) -> None:
+    """Raise ValueError for a county without a tax rate or a tier outside 1..TIER_COUNT."""
+    if counties:
+        unknown = [county for county in counties if county not in set(county_tax_rates["County"])]
+        if unknown:
+            raise ValueError(f"Unknown counties: {', '.join(unknown)} (see County_Tax_Rates.csv)")
+    if not tiers:
+        raise ValueError("No credit tiers selected")
+    invalid = [tier for tier in tiers if not 1 <= tier <= TIER_COUNT]
+    if invalid:
+        raise ValueError(f"Credit tiers must be between 1 and {TIER_COUNT}, got {', '.join(map(str, invalid))}")
+
+
+def price_inventory(
+    counties: Optional[Sequence[str]] = None,
+    tiers: Sequence[int] = tuple(range(1, TIER_COUNT + 1)),
+    markups: Sequence[bool] = (False, True),
+    trade_value: float = 0.0,
+    cash_down: float = 0.0,
+    lowest: bool = False,
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[pd.DataFrame]:
+    """Yield quote DataFrames for the whole inventory, ``chunk_size`` vehicles at a time.
+
+    Vehicles are priced in a pool of ``workers`` processes (all cores by
+    default) and chunks are yielded in inventory order as they complete.
+    The counties and tiers are checked with check_selection when this is
+    called, before any worker starts.
+    """
+    _, vehicle_data, county_tax_rates = read_sources()
+    check_selection(county_tax_rates, counties, tiers)
+    vehicles = [
+        {column: row.get(column) for column in ("VIN", "ModelNumber", "Model", "Trim", "MSRP")}
+        for row in vehicle_data.to_dict("records")
+        if isinstance(row.get("VIN"), str)
+    ]
+    init_args = (counties, tiers, markups, trade_value, cash_down, lowest)
+    return _price_chunks(vehicles, init_args, workers, chunk_size)
+
+
+def _price_chunks(vehicles: List[dict], init_args: tuple, workers: Optional[int],
+                  chunk_size: int) -> Iterator[pd.DataFrame]:
+    with Pool(processes=workers, initializer=_init_worker, initargs=init_args) as pool:
+        chunk: List[pd.DataFrame] = []
+        for frame in pool.imap(price_vehicle, vehicles, chunksize=max(1, chunk_size // 2)):
+            chunk.append(frame)
+            if len(chunk) >= chunk_size:
+                yield pd.concat(chunk, ignore_index=True)
+                chunk = []
+        if chunk:
+            yield pd.concat(chunk, ignore_index=True)
+
+
+def write_chunks(chunks: Iterator[pd.DataFrame], output: str, fmt: str) -> int:
+    """Stream chunks to ``output`` and return the number of rows written."""
+    rows = 0
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output, table.schema)
+                writer.write_table(table.cast(writer.schema))
+                rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
+
+    with open(output, "w", newline="", encoding="utf-8") as f:
+        for chunk in chunks:
+            chunk.to_csv(f, header=rows == 0, index=False)
+            rows += len(chunk)
+    return rows
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Price the whole inventory across tiers, terms, mileages and counties.")
+    parser.add_argument("--output", default="inventory_quotes.csv", help="Output .csv or .parquet file.")
+    parser.add_argument("--format", choices=("csv", "parquet"),
+                        help="Output format; inferred from the output extension by default.")
+    parser.add_argument("--counties", help="Comma-separated counties to price (default: all).")
+    parser.add_argument("--tiers", type=_int_list, default=list(range(1, TIER_COUNT + 1)),
+                        help="Comma-separated credit tiers (default: 1-8).")
+    parser.add_argument("--markup", choices=("with", "without", "both"), default="both",
+                        help="Price with the money factor markup, without it, or both.")
+    parser.add_argument("--trade", type=float, default=0.0, help="Trade value applied to every quote.")
+    parser.add_argument("--down", type=float, default=0.0, help="Cash down applied to every quote.")
+    parser.add_argument("--lowest", action="store_true",
+                        help="Keep only the lowest payment per vehicle, county, tier and markup.")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count).")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Vehicles per written chunk.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    fmt = args.format or ("parquet" if os.path.splitext(args.output)[1].lower() == ".parquet" else "csv")
+    counties = [county.strip() for county in args.counties.split(",")] if args.counties else None
+    markups = {"with": (True,), "without": (False,), "both": (False, True)}[args.markup]
+    try:
+        chunks = price_inventory(
+            counties=counties,
+            tiers=args.tiers,
+            markups=markups,
+            trade_value=args.trade,
+            cash_down=args.down,
+            lowest=args.lowest,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+        )
+    except ValueError as e:
+        sys.exit(f"❌ {e}")
+    rows = write_chunks(chunks, args.output, fmt)
+    print(f"✅ Saved {rows} quotes to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
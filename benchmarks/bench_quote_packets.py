@@ -0,0 +1,38 @@
+"""Measure quote packet rendering throughput in pages per second.
+
+Usage: python benchmarks/bench_quote_packets.py [pages]
+
+Builds one quote sheet per inventory VIN, repeats them up to ``pages``
+(default 400) and renders the packet with one worker and with every core.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from data_loader import read_sources  # noqa: E402
+from pdf_utils import _WEASYPRINT_AVAILABLE  # noqa: E402
+from quote_packets import DEFAULT_CHUNK_SIZE, build_quote_pages, render_pdf_parts  # noqa: E402
+
+
+def main(argv) -> None:
+    total = int(argv[0]) if argv else 400
+    _, vehicle_data, _ = read_sources()
+    vins = vehicle_data["VIN"].dropna().tolist()
+    customers = pd.DataFrame({"Customer": [f"Customer {i}" for i in range(len(vins))], "VIN": vins})
+    pages = build_quote_pages(customers)
+    pages = (pages * (total // len(pages) + 1))[:total]
+
+    print(f"{len(pages)} pages, {'WeasyPrint' if _WEASYPRINT_AVAILABLE else 'ReportLab'} backend")
+    for workers in (1, os.cpu_count()):
+        start = time.perf_counter()
+        size = sum(len(part) for part in render_pdf_parts(pages, DEFAULT_CHUNK_SIZE, workers))
+        elapsed = time.perf_counter() - start
+        print(f"  {workers:>2} workers: {len(pages) / elapsed:8.1f} pages/s  ({size / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,37 @@
+"""Compare the scraper's HTML parser backends on saved vehicle pages.
+
+Usage: python benchmarks/bench_scraper_parse.py [page.html ...]
+
+Defaults to every ``*.html`` file in benchmarks/fixtures.
+"""
+import glob
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from update_locator_inventory import FIELD_EXTRACTORS, parse_vehicle_page  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def main(paths) -> None:
+    paths = paths or sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html")))
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        print(f"{os.path.basename(path)} ({len(html) / 1024:.0f} KiB)")
+        baseline = parse_vehicle_page(html, path, "bs4")
+        timings = {}
+        for name in sorted(FIELD_EXTRACTORS):
+            if parse_vehicle_page(html, path, name) != baseline:
+                print(f"  {name:>5}: record differs from bs4")
+            runs, total = timeit.Timer(lambda: parse_vehicle_page(html, path, name)).autorange()
+            timings[name] = total / runs
+        for name, seconds in timings.items():
+            print(f"  {name:>5}: {seconds * 1000:8.3f} ms/page  ({timings['bs4'] / seconds:5.1f}x vs bs4)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,185 @@
+"""Compare VIN decode latency and hit rate on raw photos and preprocessed images.
+
+Usage: python benchmarks/bench_vin_decode.py [image_dir]
+       python benchmarks/bench_vin_decode.py --synthetic 10
+       python benchmarks/bench_vin_decode.py --synthetic 8 --size 2016x1512 --write benchmarks/fixtures/vin_labels
+
+Images are named after the VIN they show, e.g. ``5NMJA3DE4SH578338.jpg`` or
+``5NMJA3DE4SH578338_door.jpg``; the default directory is
+benchmarks/fixtures/vin_labels, which holds the checked-in synthetic set.
+``--synthetic N`` instead renders N label photos (Code 39 barcode and
+printed VIN, stored sideways with an EXIF rotation, 12MP unless ``--size``
+says otherwise) for inventory VINs, and ``--write DIR`` saves them as
+fixtures instead of measuring. Decoders that are not installed are skipped.
+"""
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from PIL import Image, ImageDraw, ImageFont  # noqa: E402
+
+from vin_preprocessing import prepare_image  # noqa: E402
+from vin_recognition import STAGE_STATS, decode_barcode, detect_vin, find_vin, ocr_texts  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "vin_labels")
+PHOTO_SIZE = (4032, 3024)
+SHADING_CELL = 48  # pixels per random value in the smooth background shading
+SENSOR_NOISE = 2.0  # gray levels of per-pixel noise
+
+
+def synthetic_label(vin: str, rng: random.Random, size=PHOTO_SIZE) -> bytes:
+    """Render a phone photo of a VIN label, stored sideways with an EXIF rotation.
+
+    The layout is drawn for a 12MP frame and scaled to ``size``.
+    """
+    from reportlab.graphics.barcode.code39 import Standard39
+
+    k = size[0] / PHOTO_SIZE[0]
+    noise_rng = np.random.default_rng(rng.randrange(2 ** 32))
+    shading = noise_rng.normal(110, 35, (size[1] // SHADING_CELL + 1, size[0] // SHADING_CELL + 1))
+    background = Image.fromarray(np.clip(shading, 0, 255).astype(np.uint8)).resize(size, Image.Resampling.BICUBIC)
+    pixels = np.asarray(background, dtype=np.float64) + noise_rng.normal(0, SENSOR_NOISE, size[::-1])
+    photo = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).convert("RGB")
+    draw = ImageDraw.Draw(photo)
+    left, top = rng.randrange(200, 1800) * k, rng.randrange(200, 1600) * k
+    draw.rectangle((left, top, left + 1900 * k, top + 900 * k), fill="white")
+
+    barcode = Standard39(vin, checksum=0)
+    barcode.validate()
+    barcode.encode()
+    barcode.decompose()
+    x, narrow = left + 100 * k, 5 * k
+    for element in barcode.decomposed:
+        width = narrow * (3 if element.isupper() else 1)
+        if element in "bB":
+            draw.rectangle((x, top + 100 * k, x + width - 1, top + 480 * k), fill="black")
+        x += width
+    draw.text((left + 100 * k, top + 560 * k), vin, fill="black", font=ImageFont.load_default(size=round(120 * k)))
+
+    photo = photo.transpose(Image.Transpose.ROTATE_90)
+    exif = Image.Exif()
+    exif[0x0112] = 6  # viewer rotates 90 degrees clockwise
+    buffer = BytesIO()
+    photo.save(buffer, "JPEG", quality=85, exif=exif)
+    return buffer.getvalue()
+
+
+def load_fixtures(args):
+    if args.synthetic:
+        from data_loader import read_sources
+
+        _, vehicle_data, _ = read_sources()
+        rng = random.Random(0)
+        vins = rng.sample(vehicle_data["VIN"].dropna().tolist(), args.synthetic)
+        return [(vin, synthetic_label(vin, rng, args.size)) for vin in vins]
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(args.image_dir, "*"))):
+        if os.path.splitext(path)[1].lower() in (".jpg", ".jpeg", ".png"):
+            with open(path, "rb") as f:
+                fixtures.append((os.path.basename(path).split("_")[0].split(".")[0].upper(), f.read()))
+    return fixtures
+
+
+def available_decoders():
+    decoders = {}
+    try:
+        import pyzbar.pyzbar  # noqa: F401
+        decoders["barcode"] = (
+            lambda data: decode_barcode(Image.open(BytesIO(data))),
+            lambda data: decode_barcode(prepare_image(data).gray),
+        )
+    except Exception as e:
+        print(f"  barcode: skipped ({e})")
+    try:
+        import pytesseract
+
+        pytesseract.get_tesseract_version()
+        decoders["tesseract"] = (
+            lambda data: find_vin([pytesseract.image_to_string(Image.open(BytesIO(data)))]),
+            lambda data: find_vin(ocr_texts(prepare_image(data), "tesseract")),
+        )
+    except Exception as e:
+        print(f"  tesseract: skipped ({e})")
+    try:
+        import easyocr
+
+        reader = easyocr.Reader(["en"], gpu=False)
+        decoders["easyocr"] = (
+            lambda data: find_vin(text for _, text, _ in reader.readtext(np.array(Image.open(BytesIO(data))))),
+            lambda data: find_vin(ocr_texts(prepare_image(data), "easyocr")),
+        )
+    except Exception as e:
+        print(f"  easyocr: skipped ({e})")
+    return decoders
+
+
+def measure(decode, fixtures):
+    hits, start = 0, time.perf_counter()
+    for vin, data in fixtures:
+        hits += decode(data) == vin
+    return (time.perf_counter() - start) / len(fixtures), hits / len(fixtures)
+
+
+def _size(value: str):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def write_fixtures(fixtures, directory: str) -> None:
+    os.makedirs(directory, exist_ok=True)
+    for vin, data in fixtures:
+        with open(os.path.join(directory, f"{vin}.jpg"), "wb") as f:
+            f.write(data)
+    print(f"✅ Wrote {len(fixtures)} label photos to {directory}")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("image_dir", nargs="?", default=FIXTURE_DIR)
+    parser.add_argument("--synthetic", type=int, metavar="N", help="Render N synthetic label photos instead.")
+    parser.add_argument("--size", type=_size, default=PHOTO_SIZE, metavar="WxH",
+                        help="Size of the synthetic photos before the EXIF rotation (default: 4032x3024).")
+    parser.add_argument("--write", metavar="DIR", help="Save the synthetic photos to DIR instead of measuring.")
+    args = parser.parse_args(argv)
+
+    fixtures = load_fixtures(args)
+    if not fixtures:
+        sys.exit(f"No label images in {args.image_dir}; add photos named after their VIN or use --synthetic N.")
+    if args.write:
+        if not args.synthetic:
+            sys.exit("--write needs --synthetic N.")
+        write_fixtures(fixtures, args.write)
+        return
+
+    pixels = np.mean([np.prod(Image.open(BytesIO(data)).size) for _, data in fixtures])
+    prepared = prepare_image(fixtures[0][1])
+    seconds, _ = measure(lambda data: prepare_image(data).binary(), fixtures)
+    print(f"{len(fixtures)} images, {pixels / 1e6:.1f} MP on average")
+    print(f"  preprocessing: {seconds * 1000:8.1f} ms/image -> {prepared.gray.size[0]}x{prepared.gray.size[1]}, "
+          f"label region {prepared.region}")
+
+    decoders = available_decoders()
+    for name, (raw, pipeline) in decoders.items():
+        raw_seconds, raw_hits = measure(raw, fixtures)
+        seconds, hits = measure(pipeline, fixtures)
+        print(f"  {name:>9}: raw {raw_seconds * 1000:8.1f} ms/image, {raw_hits:4.0%} hit"
+              f" | preprocessed {seconds * 1000:8.1f} ms/image, {hits:4.0%} hit")
+
+    engine = next((name for name in ("tesseract", "easyocr") if name in decoders), None)
+    if engine:
+        STAGE_STATS.clear()
+        seconds, hits = measure(lambda data: detect_vin(data, engine).vin, fixtures)
+        print(f"  {'cascade':>9}: {seconds * 1000:8.1f} ms/image, {hits:4.0%} hit ({engine} for OCR)")
+        for stage, stats in STAGE_STATS.info().items():
+            print(f"    {stage:>13}: {stats['calls']:4d} runs, {stats['hits']:4d} hits, {stats['mean_ms']:8.1f} ms average")
+
+
+if __name__ == "__main__":
+    main()
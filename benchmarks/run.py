@@ -0,0 +1,327 @@
+"""Micro-benchmarks for the pricing, data loading, PDF and scraper hot paths.
+
+Usage: python benchmarks/run.py               # compare with benchmarks/baselines.json
+       python benchmarks/run.py --save        # record the current timings as baselines
+       python benchmarks/run.py -k pdf -k sort  # only cases whose name contains "pdf" or "sort"
+
+Each case is timed ``--measurements`` times with timeit, each time for
+enough calls to take about 0.2 s. The measurements of all cases are
+interleaved, so a slow spell on the machine affects every case a little
+instead of one case a lot, and the median is kept. --save records those
+medians as baselines.
+A case whose median is more than ``--tolerance`` slower than its baseline
+fails the run with exit status 1. Baselines depend on the machine, so
+record them with --save on the machine that runs the comparison.
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import timeit
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from streamlit.logger import set_log_level  # noqa: E402
+
+import data_loader  # noqa: E402
+import pdf_utils  # noqa: E402
+from lease_calculations import calculate_ccr_full, calculate_payment_from_ccr  # noqa: E402
+from quote_grid import GRID_CACHE, get_quote_grid, quote_options_from_grid  # noqa: E402
+from update_locator_inventory import FIELD_EXTRACTORS, parse_vehicle_page  # noqa: E402
+from utils import PAYMENT_CACHE, calculate_option_payment, sort_quote_options  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(BENCH_DIR, "baselines.json")
+SCRAPER_FIXTURE = os.path.join(BENCH_DIR, "fixtures", "vehicle_page.html")
+DEFAULT_MEASUREMENTS = 21
+DEFAULT_TOLERANCE = 0.2  # fraction slower than the baseline that counts as a regression
+
+# A quote that exercises every pricing input.
+VIN = "5NMJA3DE4SH578338"
+COUNTY = "Marion"
+TIER = 1
+PRICING = dict(SP=35000.0, B=1500.0, RES=20300.0, F=0.00215, W=36, τ=0.07, M=962.50)
+TRADE_VALUE = 2000.0
+CASH_DOWN = 1000.0
+
+
+class Skip(Exception):
+    """Raised by a case whose code path is not available here."""
+
+
+CASES: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def case(name: str):
+    """Register a setup function that returns the callable to time."""
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def _vehicle_quote():
+    snapshot = data_loader.load_snapshot()
+    vehicle = data_loader.lookup_vehicle(snapshot.vehicle_index, VIN)
+    programs = data_loader.lookup_programs(
+        snapshot.program_index, vehicle.model_number, data_loader.vin_model_year(VIN)
+    )
+    rates = snapshot.county_tax_rates
+    tax_rate = float(rates.loc[rates["County"] == COUNTY, "Tax Rate"].iloc[0]) / 100.0
+    return vehicle, programs, tax_rate
+
+
+def _quote_options():
+    vehicle, programs, tax_rate = _vehicle_quote()
+    grid = get_quote_grid(VIN, programs, vehicle.msrp, tax_rate)
+    return quote_options_from_grid(grid, TIER, True), tax_rate
+
+
+@case("calculate_ccr_full")
+def bench_ccr_full():
+    p = PRICING
+    return lambda: calculate_ccr_full(p["SP"], p["B"], 0.0, TRADE_VALUE, 0.0, p["M"], 0.0,
+                                      p["RES"], p["F"], p["W"], p["τ"])
+
+
+@case("calculate_payment_from_ccr")
+def bench_payment_from_ccr():
+    p = PRICING
+    ccr = calculate_ccr_full(p["SP"], p["B"], 0.0, TRADE_VALUE, 0.0, p["M"], 0.0,
+                             p["RES"], p["F"], p["W"], p["τ"])[0]
+    return lambda: calculate_payment_from_ccr(p["SP"], ccr, p["RES"], p["W"], p["F"], p["τ"], p["M"])
+
+
+def _option_payment():
+    p = PRICING
+    return calculate_option_payment(p["SP"], p["B"], p["RES"], p["F"], p["W"], TRADE_VALUE, CASH_DOWN, p["τ"])
+
+
+@case("calculate_option_payment (uncached)")
+def bench_option_payment_uncached():
+    def run():
+        PAYMENT_CACHE.clear()
+        return _option_payment()
+    return run
+
+
+@case("calculate_option_payment (cached)")
+def bench_option_payment_cached():
+    _option_payment()
+    return _option_payment
+
+
+@case("sort_quote_options Lowest Payment (uncached)")
+def bench_sort_uncached():
+    options, tax_rate = _quote_options()
+
+    def run():
+        PAYMENT_CACHE.clear()
+        return sort_quote_options(list(options), "Lowest Payment", TRADE_VALUE, CASH_DOWN, tax_rate)
+    return run
+
+
+@case("sort_quote_options Lowest Payment (cached)")
+def bench_sort_cached():
+    options, tax_rate = _quote_options()
+    sort_quote_options(list(options), "Lowest Payment", TRADE_VALUE, CASH_DOWN, tax_rate)
+    return lambda: sort_quote_options(list(options), "Lowest Payment", TRADE_VALUE, CASH_DOWN, tax_rate)
+
+
+@case("load_data cold (no data cache)")
+def bench_load_cold():
+    cache_dir = tempfile.mkdtemp(prefix="bench_data_cache_")
+    atexit.register(shutil.rmtree, cache_dir, True)
+    default_dir = data_loader.CACHE_DIR
+
+    def run():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        data_loader.CACHE_DIR = cache_dir
+        try:
+            return data_loader.read_sources()
+        finally:
+            data_loader.CACHE_DIR = default_dir
+    return run
+
+
+@case("load_data from data cache")
+def bench_load_disk_cache():
+    data_loader.read_sources()
+    return data_loader.read_sources
+
+
+@case("load_data warm (shared snapshot)")
+def bench_load_warm():
+    data_loader.load_data()
+    return data_loader.load_data
+
+
+@case("quote options (grid cold)")
+def bench_quote_options_cold():
+    vehicle, programs, tax_rate = _vehicle_quote()
+
+    def run():
+        GRID_CACHE.clear()
+        grid = get_quote_grid(VIN, programs, vehicle.msrp, tax_rate)
+        return quote_options_from_grid(grid, TIER, True)
+    return run
+
+
+@case("quote options (grid cached)")
+def bench_quote_options_cached():
+    vehicle, programs, tax_rate = _vehicle_quote()
+    get_quote_grid(VIN, programs, vehicle.msrp, tax_rate)
+    return lambda: quote_options_from_grid(get_quote_grid(VIN, programs, vehicle.msrp, tax_rate), TIER, True)
+
+
+def _pdf_case(weasyprint: bool):
+    if weasyprint and not pdf_utils._WEASYPRINT_AVAILABLE:
+        raise Skip("WeasyPrint or its system libraries are not installed")
+    options, tax_rate = _quote_options()
+    vehicle, _, _ = _vehicle_quote()
+    vehicle_info = {"year": 2025, "make": "Hyundai", "model": vehicle.model, "trim": vehicle.trim,
+                    "msrp": vehicle.msrp, "vin": VIN}
+    if weasyprint:
+        pdf_utils.prewarm_pdf_renderer(background=False)
+
+    def run():
+        pdf_utils.PDF_CACHE.clear()
+        available = pdf_utils._WEASYPRINT_AVAILABLE
+        pdf_utils._WEASYPRINT_AVAILABLE = weasyprint
+        try:
+            return pdf_utils.generate_quote_pdf(options[:4], tax_rate, CASH_DOWN, "Benchmark Customer", vehicle_info)
+        finally:
+            pdf_utils._WEASYPRINT_AVAILABLE = available
+    return run
+
+
+@case("generate_quote_pdf (WeasyPrint)")
+def bench_pdf_weasyprint():
+    return _pdf_case(weasyprint=True)
+
+
+@case("generate_quote_pdf (ReportLab)")
+def bench_pdf_reportlab():
+    return _pdf_case(weasyprint=False)
+
+
+def _scraper_case(parser: str):
+    def setup():
+        with open(SCRAPER_FIXTURE, encoding="utf-8") as f:
+            html = f.read()
+        return lambda: parse_vehicle_page(html, SCRAPER_FIXTURE, parser)
+    return setup
+
+
+for _parser in sorted(FIELD_EXTRACTORS):
+    case(f"scraper parse ({_parser})")(_scraper_case(_parser))
+
+
+class Measurement:
+    """Times one case with a call count fixed by timeit's autorange."""
+
+    def __init__(self, func: Callable[[], object]):
+        self.timer = timeit.Timer(func)
+        self.number, _ = self.timer.autorange()
+
+    def __call__(self) -> float:
+        """Return the per-call time in seconds of one timed run."""
+        return self.timer.timeit(self.number) / self.number
+
+
+def load_baselines(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def machine() -> str:
+    return f"{platform.machine()} {platform.processor() or platform.system()}, {os.cpu_count()} CPUs, Python {platform.python_version()}"
+
+
+def _format(seconds: float) -> str:
+    if seconds >= 0.1:
+        return f"{seconds:8.3f} s "
+    if seconds >= 1e-4:
+        return f"{seconds * 1e3:8.3f} ms"
+    return f"{seconds * 1e6:8.3f} µs"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", dest="patterns", action="append", default=[],
+                        help="Only run cases whose name contains this text (repeatable).")
+    parser.add_argument("--save", action="store_true", help="Write the timings to the baseline file.")
+    parser.add_argument("--baselines", default=BASELINE_FILE, help="Baseline JSON file.")
+    parser.add_argument("--measurements", type=int, default=DEFAULT_MEASUREMENTS,
+                        help="Measurements per case; the median is kept.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown over the baseline, e.g. 0.5 for 50%%.")
+    parser.add_argument("--list", action="store_true", help="List the cases and exit.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    if args.list:
+        print("\n".join(CASES))
+        return
+    # Streamlit warns about running outside `streamlit run` on cached calls.
+    set_log_level("error")
+
+    baselines = load_baselines(args.baselines)
+    recorded = baselines.get("cases", {})
+    if recorded and not args.save and baselines.get("machine") != machine():
+        print(f"Baselines were recorded on {baselines.get('machine')}; timings may not compare.")
+    print(f"{machine()}, median of {args.measurements}, tolerance {args.tolerance:.0%}")
+
+    width = max(map(len, CASES))
+    measurements: Dict[str, Measurement] = {}
+    for name, setup in CASES.items():
+        if args.patterns and not any(pattern in name for pattern in args.patterns):
+            continue
+        try:
+            measurements[name] = Measurement(setup())
+        except Skip as e:
+            print(f"  {name:<{width}}  skipped: {e}")
+
+    # Round-robin, so the measurements of each case are spread over the whole run.
+    timings: Dict[str, List[float]] = {name: [] for name in measurements}
+    for _ in range(args.measurements):
+        for name, measurement in measurements.items():
+            timings[name].append(measurement())
+
+    results: Dict[str, float] = {}
+    regressions: List[str] = []
+    for name, times in timings.items():
+        seconds = results[name] = statistics.median(times)
+        baseline = recorded.get(name)
+        if baseline is None:
+            print(f"  {name:<{width}}  {_format(seconds)}  (no baseline)")
+            continue
+        change = seconds / baseline - 1
+        status = "REGRESSION" if change > args.tolerance else "ok"
+        if status != "ok":
+            regressions.append(name)
+        print(f"  {name:<{width}}  {_format(seconds)}  baseline {_format(baseline)}  {change:+6.0%}  {status}")
+
+    if args.save:
+        cases = {**recorded, **results} if args.patterns else results
+        with open(args.baselines, "w", encoding="utf-8") as f:
+            json.dump({"machine": machine(), "cases": cases}, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"✅ Saved {len(results)} baselines to {args.baselines}")
+    elif regressions:
+        sys.exit(f"❌ {len(regressions)} case(s) slower than baseline: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
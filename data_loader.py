@@ -1,13 +1,63 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
 import pandas as pd
 import streamlit as st
 
-@st.cache_data
-def load_data():
-    """Load lease programs, vehicle inventory, and county tax rates."""
-    lease_programs = pd.read_csv("All_Lease_Programs_Database.csv", encoding="utf-8-sig")
+logger = logging.getLogger(__name__)
+
+PROGRAMS_FILE = "All_Lease_Programs_Database.csv"
+INVENTORY_FILE = "Locator_Detail_Updated.xlsx"
+TAX_RATES_FILE = "County_Tax_Rates.csv"
+SOURCE_FILES = (PROGRAMS_FILE, INVENTORY_FILE, TAX_RATES_FILE)
+RELOAD_INTERVAL = 30  # seconds between checks of the source files for changes
+RELOAD_SETTLE = 2  # seconds a changed file must stay unchanged before it is read
+
+# Parsed copies of the files above; bump CACHE_VERSION when a reader changes.
+CACHE_DIR = ".data_cache"
+CACHE_VERSION = 1
+
+TIER_COLUMNS = [f"Tier {i}" for i in range(1, 9)]
+
+# VIN position 10 encodes the model year; this maps the 2010-2039 cycle.
+VIN_YEAR_CODES = "ABCDEFGHJKLMNPRSTVWXY123456789"
+VIN_YEAR_BASE = 2010
+
+
+class ProgramRecord(NamedTuple):
+    """Lease program terms for one ModelNumber, Year and Term."""
+    year: int
+    term: int
+    residual: float
+    lease_cash: float
+    money_factors: Tuple[float, ...]  # Tier 1..8, NaN where the tier has no rate
+    make: Optional[str]
+    model: Optional[str]
+    trim: Optional[str]
+
+
+class VehicleRecord(NamedTuple):
+    """One inventory vehicle with MSRP already parsed to a float."""
+    vin: str
+    model_number: Optional[str]
+    model: Optional[str]
+    trim: Optional[str]
+    msrp: float
+
+
+def _read_lease_programs(path: str) -> pd.DataFrame:
+    lease_programs = pd.read_csv(path, encoding="utf-8-sig")
     lease_programs.columns = lease_programs.columns.str.strip()
+    return lease_programs
+
 
-    vehicle_data = pd.read_excel("Locator_Detail_Updated.xlsx")
+def _read_inventory(path: str) -> pd.DataFrame:
+    vehicle_data = pd.read_excel(path)
     vehicle_data.columns = vehicle_data.columns.str.strip()
     if "MSRP" in vehicle_data.columns:
         vehicle_data["MSRP"] = (
@@ -17,8 +67,317 @@ def load_data():
             .str.replace(",", "", regex=False)
         )
         vehicle_data["MSRP"] = pd.to_numeric(vehicle_data["MSRP"], errors="coerce")
+    return vehicle_data
 
-    county_tax_rates = pd.read_csv("County_Tax_Rates.csv")
+
+def _read_tax_rates(path: str) -> pd.DataFrame:
+    county_tax_rates = pd.read_csv(path)
     county_tax_rates.columns = county_tax_rates.columns.str.strip()
+    return county_tax_rates
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: str, write) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_cached_frame(source: str, reader: Callable[[str], pd.DataFrame]) -> pd.DataFrame:
+    """Return ``reader(source)`` through a binary cache in CACHE_DIR.
+
+    The cache is reused while the source's mtime and size are unchanged. If
+    they changed but the SHA-256 still matches, the cache is reused and its
+    manifest refreshed. Otherwise the source is parsed again and the cache
+    rewritten. Unreadable or unwritable cache files fall back to the source.
+    """
+    stat = os.stat(source)
+    name = os.path.basename(source)
+    cache_path = os.path.join(CACHE_DIR, f"{name}.pkl")
+    manifest_path = os.path.join(CACHE_DIR, f"{name}.json")
+
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    fresh = manifest.get("version") == CACHE_VERSION and os.path.exists(cache_path)
+    sha256 = None
+    if fresh and (manifest.get("mtime_ns"), manifest.get("size")) != (stat.st_mtime_ns, stat.st_size):
+        sha256 = _file_sha256(source)
+        fresh = manifest.get("sha256") == sha256
+
+    if fresh:
+        try:
+            frame = pd.read_pickle(cache_path)
+        except Exception as exc:
+            logger.warning("Ignoring unreadable data cache %s: %s", cache_path, exc)
+        else:
+            if sha256 is not None:
+                manifest.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                _save_manifest(manifest_path, manifest)
+            return frame
+
+    frame = reader(source)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        _write_atomic(cache_path, lambda tmp: frame.to_pickle(tmp, compression=None))
+        _save_manifest(manifest_path, {
+            "version": CACHE_VERSION,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": sha256 or _file_sha256(source),
+        })
+    except OSError as exc:
+        logger.warning("Could not write data cache for %s: %s", source, exc)
+    return frame
+
+
+def _save_manifest(path: str, manifest: dict) -> None:
+    try:
+        _write_atomic(path, lambda tmp: _dump_json(tmp, manifest))
+    except OSError as exc:
+        logger.warning("Could not write data cache manifest %s: %s", path, exc)
+
+
+def _dump_json(path: str, data: dict) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def read_sources():
+    """Read lease programs, vehicle inventory and county tax rates without Streamlit caching."""
+    return (
+        load_cached_frame(PROGRAMS_FILE, _read_lease_programs),
+        load_cached_frame(INVENTORY_FILE, _read_inventory),
+        load_cached_frame(TAX_RATES_FILE, _read_tax_rates),
+    )
+
+
+def source_signature() -> Tuple[Tuple[int, int], ...]:
+    """Return (mtime_ns, size) for each source file, to tell when one has changed."""
+    signature = []
+    for path in SOURCE_FILES:
+        stat = os.stat(path)
+        signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def _optional_str(value) -> Optional[str]:
+    return None if pd.isna(value) else str(value)
+
+
+def build_program_index(lease_programs: pd.DataFrame) -> Dict[str, Dict[int, Dict[int, ProgramRecord]]]:
+    """Index lease programs as {ModelNumber: {Year: {Term: ProgramRecord}}}.
+
+    If the same ModelNumber, Year and Term appear more than once, the first
+    row in the file wins, matching the old ``iloc[0]`` behaviour.
+    """
+    programs = lease_programs.dropna(subset=["ModelNumber", "Year", "Term"])
+    money_factors = programs[TIER_COLUMNS].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    lease_cash = pd.to_numeric(programs.get("LeaseCash", 0.0), errors="coerce")
+    descriptions = [
+        programs[column] if column in programs.columns else [None] * len(programs)
+        for column in ("Make", "Model", "Trim")
+    ]
+
+    index: Dict[str, Dict[int, Dict[int, ProgramRecord]]] = {}
+    rows = zip(
+        programs["ModelNumber"], programs["Year"], programs["Term"], programs["Residual"],
+        pd.Series(lease_cash, index=programs.index).fillna(0.0), money_factors, *descriptions,
+    )
+    for model_number, year, term, residual, cash, tiers, make, model, trim in rows:
+        terms = index.setdefault(str(model_number).strip(), {}).setdefault(int(year), {})
+        if int(term) in terms:
+            continue
+        terms[int(term)] = ProgramRecord(
+            year=int(year),
+            term=int(term),
+            residual=float(residual),
+            lease_cash=float(cash),
+            money_factors=tuple(float(mf) for mf in tiers),
+            make=_optional_str(make),
+            model=_optional_str(model),
+            trim=_optional_str(trim),
+        )
+    return index
+
+
+def build_vehicle_index(vehicle_data: pd.DataFrame) -> Dict[str, VehicleRecord]:
+    """Index inventory by upper-cased VIN; the first row wins on duplicates."""
+    columns = [
+        vehicle_data[column] if column in vehicle_data.columns else [None] * len(vehicle_data)
+        for column in ("VIN", "ModelNumber", "Model", "Trim", "MSRP")
+    ]
+    index: Dict[str, VehicleRecord] = {}
+    for vin, model_number, model, trim, msrp in zip(*columns):
+        if pd.isna(vin):
+            continue
+        key = str(vin).strip().upper()
+        if key in index:
+            continue
+        index[key] = VehicleRecord(
+            vin=key,
+            model_number=_optional_str(model_number),
+            model=_optional_str(model),
+            trim=_optional_str(trim),
+            msrp=0.0 if msrp is None or pd.isna(msrp) else float(msrp),
+        )
+    return index
+
+
+class DataSnapshot(NamedTuple):
+    """One load of every source file and the indexes built from it.
+
+    Snapshots are shared by every session without copying and must be
+    treated as read-only; pandas copy-on-write (the default from pandas 3,
+    which requirements.txt pins) keeps accidental edits local.
+    """
+    version: int
+    signature: Tuple[Tuple[int, int], ...]  # source_signature() the data was read at
+    lease_programs: pd.DataFrame
+    vehicle_data: pd.DataFrame
+    county_tax_rates: pd.DataFrame
+    program_index: Dict[str, Dict[int, Dict[int, ProgramRecord]]]
+    vehicle_index: Dict[str, VehicleRecord]
+
+
+class DataStore:
+    """Holds the current DataSnapshot for the whole process.
+
+    ``refresh`` builds a complete new snapshot before swapping it in with a
+    single assignment, so readers see either the old data or the new data,
+    never a mix. A session should call ``snapshot`` once per run and use
+    that snapshot throughout.
+    """
+
+    def __init__(self):
+        self._snapshot: Optional[DataSnapshot] = None
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+
+    def snapshot(self) -> DataSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                snapshot = self._snapshot or self._load()
+        return snapshot
+
+    def refresh(self) -> DataSnapshot:
+        """Reread the source files and swap in the result."""
+        with self._lock:
+            return self._load()
+
+    def watch(
+        self,
+        on_reload: Optional[Callable[[DataSnapshot], None]] = None,
+        interval: float = RELOAD_INTERVAL,
+    ) -> None:
+        """Start a daemon thread that refreshes the snapshot when a source file changes.
+
+        ``on_reload`` runs in that thread after each new snapshot is swapped
+        in. Later calls do nothing while the watcher is running.
+        """
+        with self._lock:
+            if self._watcher is not None:
+                return
+            self._watcher = threading.Thread(
+                target=self._watch, args=(on_reload, interval), name="data-watcher", daemon=True
+            )
+            self._watcher.start()
+
+    def _watch(self, on_reload, interval) -> None:
+        failed = None  # signature of files that could not be read, not retried until they change
+        while True:
+            time.sleep(interval)
+            signature = None
+            try:
+                signature = source_signature()
+                if signature in (self.snapshot().signature, failed):
+                    continue
+                # Wait for the writer to finish; the scraper rewrites files in place.
+                time.sleep(RELOAD_SETTLE)
+                if source_signature() != signature:
+                    continue
+                snapshot = self.refresh()
+                if on_reload is not None:
+                    on_reload(snapshot)
+            except Exception:
+                failed = signature
+                logger.exception("Data reload failed; keeping the current data")
+
+    def _load(self) -> DataSnapshot:
+        signature = source_signature()
+        lease_programs, vehicle_data, county_tax_rates = read_sources()
+        snapshot = DataSnapshot(
+            version=self._snapshot.version + 1 if self._snapshot else 1,
+            signature=signature,
+            lease_programs=lease_programs,
+            vehicle_data=vehicle_data,
+            county_tax_rates=county_tax_rates,
+            program_index=build_program_index(lease_programs),
+            vehicle_index=build_vehicle_index(vehicle_data),
+        )
+        self._snapshot = snapshot
+        logger.info("Loaded data version %d", snapshot.version)
+        return snapshot
+
+
+@st.cache_resource
+def get_data_store() -> DataStore:
+    """Return the process-wide DataStore shared by every session."""
+    return DataStore()
+
+
+def load_snapshot() -> DataSnapshot:
+    """Return the current shared data without copying it."""
+    return get_data_store().snapshot()
+
+
+def load_data():
+    """Load lease programs, vehicle inventory, and county tax rates."""
+    snapshot = load_snapshot()
+    return snapshot.lease_programs, snapshot.vehicle_data, snapshot.county_tax_rates
+
+
+def lookup_vehicle(vehicle_index: Dict[str, VehicleRecord], vin: str) -> Optional[VehicleRecord]:
+    """Return the inventory record for a VIN, ignoring case and whitespace."""
+    return vehicle_index.get(vin.strip().upper()) if vin else None
+
+
+def vin_model_year(vin: str) -> Optional[int]:
+    """Return the model year encoded in the 10th VIN character, if any."""
+    if not vin or len(vin) < 10:
+        return None
+    position = VIN_YEAR_CODES.find(vin[9].upper())
+    return VIN_YEAR_BASE + position if position >= 0 else None
+
+
+def lookup_programs(
+    program_index: Dict[str, Dict[int, Dict[int, ProgramRecord]]],
+    model_number: str,
+    year: Optional[int] = None,
+) -> Dict[int, ProgramRecord]:
+    """Return {Term: ProgramRecord} for a model, or an empty dict.
 
-    return lease_programs, vehicle_data, county_tax_rates
+    When the model has programs for several years, ``year`` picks one; if it
+    is missing or not offered, the latest program year is used.
+    """
+    years = program_index.get(str(model_number).strip())
+    if not years:
+        return {}
+    if year not in years:
+        year = max(years)
+    return years[year]
@@ -1,15 +1,31 @@
 import streamlit as st
 from PIL import Image, UnidentifiedImageError
-import pytesseract
-import re
-from utils import calculate_option_payment
-from pdf_utils import generate_quote_pdf
-from typing import List, Dict, Tuple, Any
-from datetime import datetime
+from utils import calculate_option_payment, solve_for_target_payment
+from data_loader import load_snapshot
+from pdf_utils import release_quote_pdf, submit_quote_pdf
+from quote_grid import QuoteOption
+from vin_recognition import RecognizerBusy, resolve_vin, submit_vin_recognition
+from quote_document import (
+    DEALERSHIP,
+    DISCLAIMER,
+    SIGNATURE_LINE,
+    QuoteDocument,
+    QuotePage,
+    build_quote_document,
+    down_payment_ladder,
+    quote_table_html,
+)
+import uuid
+from collections.abc import Container
+from concurrent.futures import Future
+from typing import List, Dict, Optional, Tuple, Any
 
 LOGO_PATH = "drivepath_logo.png"
 LOGO_WIDTH = 300
+POLL_INTERVAL = 0.5  # seconds between checks for finished background work
+DATA_CHECK_INTERVAL = 10  # seconds between checks for reloaded data files
 DEFAULT_SORT_BY = "Lowest Payment"
+MAX_QUOTE_OPTIONS = 4  # columns on the customer quote sheet
 
 
 def render_header(
@@ -34,68 +50,108 @@ def render_header(
         )
 
 
-def render_trade_down_section() -> Tuple[float, float]:
-    trade_value = st.number_input("Trade Value ($)", min_value=0.0, key="trade_value")
+def check_data_version() -> None:
+    """Rerun the page once a newer data snapshot has been loaded; run as a polling fragment."""
+    if load_snapshot().version != st.session_state.get("data_version"):
+        st.rerun()
+
+
+def render_trade_down_section(on_change=None) -> Tuple[float, float]:
+    trade_value = st.number_input("Trade Value ($)", min_value=0.0, key="trade_value", on_change=on_change)
     money_down = st.number_input(
-        "Money Down ($)", min_value=0.0, key="default_money_down"
+        "Money Down ($)", min_value=0.0, key="default_money_down", on_change=on_change
     )
     return trade_value, money_down
 
 
 def render_filters_section(
-    quote_options: List[Dict[str, Any]]
+    quote_options: List[QuoteOption], on_change=None
 ) -> Tuple[List[int], List[int]]:
-    terms = sorted({opt["term"] for opt in quote_options})
-    mileages = sorted({opt["mileage"] for opt in quote_options})
+    terms = sorted({opt.term for opt in quote_options})
+    mileages = sorted({opt.mileage for opt in quote_options})
     term_filter = st.multiselect(
-        "Select Lease Terms", options=terms, default=terms, key="term_filter"
+        "Select Lease Terms", options=terms, default=terms, key="term_filter", on_change=on_change
     )
     mileage_filter = st.multiselect(
-        "Select Mileages", options=mileages, default=mileages, key="mileage_filter"
+        "Select Mileages", options=mileages, default=mileages, key="mileage_filter", on_change=on_change
     )
     return term_filter, mileage_filter
 
 
-def render_right_sidebar(
-    quote_options: List[Dict[str, Any]]
-) -> Tuple[float, float, str, List[int], List[int], bool, bool]:
+def _mark_settings_changed() -> None:
+    st.session_state.settings_changed = True
+
+
+def render_right_sidebar(quote_options: List[QuoteOption]) -> None:
+    """Render the financial settings; run as a fragment and read back with financial_settings().
+
+    Every setting feeds all of the quote cards, so a change reruns the whole
+    app once the fragment has stored it.
+    """
     st.markdown('<div class="right-sidebar">', unsafe_allow_html=True)
     st.header("Financial Settings")
     with st.expander("Trade & Down Payment", expanded=True):
-        trade_value, money_down = render_trade_down_section()
-        create_quote_clicked = st.button("Create Customer Quote")
+        _, money_down = render_trade_down_section(on_change=_mark_settings_changed)
+        if st.button("Create Customer Quote"):
+            st.session_state.selected_down_payment = money_down
+            st.session_state.page = "print"
+            _mark_settings_changed()
     with st.expander("Filters"):
-        term_filter, mileage_filter = render_filters_section(quote_options)
+        render_filters_section(quote_options, on_change=_mark_settings_changed)
     with st.expander("Markup", expanded=True):
         apply_markup = st.checkbox(
             "Add 0.0004 Money Factor Markup",
             value=st.session_state.get("apply_markup", True),
         )
-    st.session_state.apply_markup = apply_markup
+    with st.expander("Target Payment"):
+        st.number_input(
+            "Target Monthly Payment ($)",
+            min_value=0.0,
+            step=10.0,
+            key="target_payment",
+            help="Shows the cash down each option needs to reach this payment; 0 turns it off.",
+            on_change=_mark_settings_changed,
+        )
+    if apply_markup != st.session_state.get("apply_markup", True):
+        st.session_state.apply_markup = apply_markup
+        _mark_settings_changed()
     st.markdown("</div>", unsafe_allow_html=True)
-    sort_by = DEFAULT_SORT_BY
+    if st.session_state.pop("settings_changed", False):
+        st.rerun()
+
+
+def financial_settings() -> Tuple[float, float, str, List[int], List[int], float]:
+    """Return the values chosen in the right sidebar for the rest of the page."""
     return (
-        trade_value,
-        money_down,
-        sort_by,
-        term_filter,
-        mileage_filter,
-        create_quote_clicked,
-        apply_markup,
+        st.session_state.get("trade_value", 0.0),
+        st.session_state.get("default_money_down", 0.0),
+        DEFAULT_SORT_BY,
+        st.session_state.get("term_filter", []),
+        st.session_state.get("mileage_filter", []),
+        st.session_state.get("target_payment", 0.0),
     )
 
 
+def selected_quote_options(quote_options: List[QuoteOption]) -> List[QuoteOption]:
+    """Return the options ticked for the customer quote, at most four, in display order."""
+    selected_ids = st.session_state.get("selected_quotes", ())
+    selected = [opt for opt in quote_options if opt.id in selected_ids]
+    return selected[:MAX_QUOTE_OPTIONS]
+
+
 def render_quote_card(
-    option: Dict[str, Any],
-    option_key: str,
+    option: QuoteOption,
     trade_value: float,
     money_down: float,
     tax_rate: float,
+    is_lowest: bool = False,
+    cash_down_for_target: Optional[float] = None,
 ) -> None:
+    """Render one lease option; run as a fragment so an edit only recomputes this card."""
     if "selected_quotes" not in st.session_state:
         st.session_state.selected_quotes = set()
+    option_key = option.id
     is_selected = option_key in st.session_state.selected_quotes
-    is_lowest = option.get("is_lowest", False)
     css_class = (
         "selected-quote"
         if is_selected
@@ -109,13 +165,13 @@ def render_quote_card(
         st.markdown(f'<div class="{css_class}">', unsafe_allow_html=True)
 
         st.markdown(
-            f'<p class="term-mileage">{option["term"]} Months | {option["mileage"]:,} mi/yr</p>',
+            f'<p class="term-mileage">{option.term} Months | {option.mileage:,} mi/yr</p>',
             unsafe_allow_html=True,
         )
 
         new_selling_price = st.number_input(
             "Selling Price ($)",
-            value=float(option["selling_price"]),
+            value=float(option.selling_price),
             key=f"sp_{option_key}",
             step=100.0,
             min_value=0.0,
@@ -123,10 +179,10 @@ def render_quote_card(
         )
 
         new_lease_cash = st.number_input(
-            f"Lease Cash Used (Max: ${option['available_lease_cash']:.2f})",
+            f"Lease Cash Used (Max: ${option.available_lease_cash:.2f})",
             min_value=0.0,
-            max_value=float(option["available_lease_cash"]),
-            value=float(option["lease_cash_used"]),
+            max_value=float(option.available_lease_cash),
+            value=float(option.lease_cash_used),
             key=f"lc_{option_key}",
             step=100.0,
             help="Incentives applied; can't exceed available.",
@@ -137,9 +193,9 @@ def render_quote_card(
                 payment_data = calculate_option_payment(
                     selling_price=new_selling_price,
                     lease_cash_used=new_lease_cash,
-                    residual_value=option["residual_value"],
-                    money_factor=option["money_factor"],
-                    term=option["term"],
+                    residual_value=option.residual_value,
+                    money_factor=option.money_factor,
+                    term=option.term,
                     trade_val=trade_value,
                     cash_down=money_down,
                     tax_rt=tax_rate,
@@ -148,6 +204,17 @@ def render_quote_card(
                     f'<div class="payment-highlight">${payment_data["payment"]:,.2f}/mo</div>',
                     unsafe_allow_html=True,
                 )
+                target_payment = st.session_state.get("target_payment", 0.0)
+                if target_payment:
+                    cash_needed = cash_down_for_target
+                    if cash_needed is None or (new_selling_price, new_lease_cash) != (
+                        option.selling_price, option.lease_cash_used
+                    ):
+                        edited = option._replace(selling_price=new_selling_price, lease_cash_used=new_lease_cash)
+                        cash_needed = solve_for_target_payment(
+                            [edited], target_payment, trade_value, money_down, tax_rate
+                        )[0]
+                    st.caption(f"${cash_needed:,.2f} cash down for ${target_payment:,.2f}/mo")
             except Exception:
                 st.markdown(
                     '<div class="payment-highlight">Monthly Payment: N/A</div>',
@@ -156,9 +223,9 @@ def render_quote_card(
 
         with st.expander("Details"):
             st.write(
-                f"Residual: {option['residual_pct']:.1f}% (${option['residual_value']:,.2f})"
+                f"Residual: {option.residual_pct:.1f}% (${option.residual_value:,.2f})"
             )
-            st.write(f"Money Factor: {option['money_factor']:.6f}")
+            st.write(f"Money Factor: {option.money_factor:.6f}")
             st.write(f"Base Payment: ${payment_data['base_payment']:,.2f}")
             st.write(f"Tax: ${payment_data['tax_payment']:,.2f}")
 
@@ -167,21 +234,43 @@ def render_quote_card(
             st.session_state.selected_quotes.add(option_key)
         else:
             st.session_state.selected_quotes.discard(option_key)
+        if selected != is_selected:
+            # A fragment rerun skips main(), so restart the PDF prefetch here.
+            chosen = selected_quote_options(st.session_state.get("quote_options", []))
+            if chosen:
+                start_quote_pdf(customer_quote_document(chosen, tax_rate, money_down))
 
         st.markdown("</div></div>", unsafe_allow_html=True)
 
 
-def extract_vin_from_image(image_file):
-    """Return a VIN string from an uploaded image if detected."""
-    image = Image.open(image_file)
-    text = pytesseract.image_to_string(image)
-    vin_match = re.search(r"\b[A-HJ-NPR-Z0-9]{17}\b", text)
-    if vin_match:
-        return vin_match.group(0)
-    return None
+def recognize_vin_photo(photo, known_vins: Container[str] = ()) -> str | None:
+    """Return the VIN in an uploaded or camera photo once background OCR has read it.
+
+    Likely misreads are corrected against ``known_vins``, e.g. the inventory index.
+    """
+    try:
+        vin_future = submit_vin_recognition(photo.getvalue())
+    except RecognizerBusy:
+        st.warning("\u26A0\uFE0F The VIN reader is busy. Try again in a moment.")
+        return None
+    if not vin_future.done():
+        st.fragment(render_vin_progress, run_every=POLL_INTERVAL)(vin_future)
+        return None
+    vin = vin_future.result()
+    if not vin:
+        st.warning("\u26A0\uFE0F Couldn't detect a VIN in the image. Try again.")
+        return None
+    return resolve_vin(vin, known_vins) or vin
 
 
-def render_vin_scanner_button() -> str | None:
+def render_vin_progress(vin_future: Future) -> None:
+    """Show that OCR is running and rerun the page when it finishes."""
+    if vin_future.done():
+        st.rerun()
+    st.caption("\u23f3 Reading VIN...")
+
+
+def render_vin_scanner_button(known_vins: Container[str] = ()) -> str | None:
     """Allow user to upload a VIN photo and return the detected text."""
     uploaded_file = st.file_uploader(
         "\U0001F4F7 Take or upload a photo of the VIN label",
@@ -189,16 +278,15 @@ def render_vin_scanner_button() -> str | None:
         key="vin_photo_uploader",
     )
     if uploaded_file:
-        vin = extract_vin_from_image(uploaded_file)
+        vin = recognize_vin_photo(uploaded_file, known_vins)
         if vin:
             st.success(f"\u2705 VIN Detected: {vin}")
             return vin
-        st.warning("\u26A0\uFE0F Couldn't detect a VIN in the image. Try again.")
     return None
 
 
 def render_customer_quote_page(
-    selected_options: List[Dict[str, Any]],
+    selected_options: List[QuoteOption],
     tax_rate: float,
     base_down: float,
 ) -> None:
@@ -268,74 +356,77 @@ def render_customer_quote_page(
         st.info("No quotes selected")
         return
 
+    # The sheet is priced once; the PDF renders it in the background while the page is drawn.
+    quote_doc = customer_quote_document(selected_options, tax_rate, base_down)
+    pdf_future = start_quote_pdf(quote_doc)
+
     # Professional Header
     st.markdown('<div class="quote-summary">', unsafe_allow_html=True)
     st.subheader("Lease Quote Summary")
-    customer_name = st.session_state.get("customer_name", "N/A")
     phone = st.session_state.get("phone_number", "N/A")
     email = st.session_state.get("email", "N/A")
-    vehicle_details = (
-        f"{st.session_state.get('model_year', 'N/A')} {st.session_state.get('make', 'N/A')} "
-        f"{st.session_state.get('model', 'N/A')} {st.session_state.get('trim', 'N/A')} | "
-        f"MSRP: ${st.session_state.get('msrp', 0):,.2f} | VIN: {st.session_state.get('vin', 'N/A')}"
-    )
-    st.write(f"**Customer:** {customer_name}")
+    st.write(f"**Customer:** {quote_doc.customer_name}")
     st.write(f"**Phone:** {phone}  |  **Email:** {email}")
-    st.write(f"**Vehicle:** {vehicle_details}")
-    st.write(
-        f"**Dealership:** Mathew's Hyundai | **Date:** {datetime.today().strftime('%B %d, %Y')}"
-    )
+    st.write(f"**Vehicle:** {quote_doc.vehicle_summary}")
+    st.write(f"**Dealership:** {DEALERSHIP} | **Date:** {quote_doc.date_str}")
 
     st.markdown(
         "<h4>Please select the term and mileage limit you would like us to submit to the bank.</h4>",
         unsafe_allow_html=True,
     )
-
-    header_html = "<table class='lease-table'><tr><th>Down Payment</th>"
-    for opt in selected_options:
-        header_html += f"<th>{opt['term']} Mo | {opt['mileage']:,} mi/yr</th>"
-    header_html += "</tr>"
-
-    body_html = ""
-    default_rows = [base_down + 1500 * i for i in range(3)]
-    for down_val in default_rows:
-        body_html += "<tr>"
-        body_html += f"<td><strong>${down_val:,.2f} Down</strong></td>"
-        for opt in selected_options:
-            payment_data = calculate_option_payment(
-                opt["selling_price"],
-                opt["lease_cash_used"],
-                opt["residual_value"],
-                opt["money_factor"],
-                opt["term"],
-                0.0,
-                down_val,
-                tax_rate,
-            )
-            payment = payment_data["payment"]
-            body_html += f'<td>☐ ${payment:,.2f}/mo</td>'
-        body_html += "</tr>"
-
-    footer_html = "</table>"
-    st.markdown(header_html + body_html + footer_html, unsafe_allow_html=True)
+    st.markdown(quote_table_html(quote_doc), unsafe_allow_html=True)
 
     # Signature Line (printable)
     st.markdown('<div class="signature-section">', unsafe_allow_html=True)
-    st.write(
-        "Customer Signature: _______________________________ Date: _______________"
-    )
+    st.write(SIGNATURE_LINE)
     st.markdown("</div>", unsafe_allow_html=True)
 
     # Disclaimers
     st.markdown('<div class="disclaimers">', unsafe_allow_html=True)
-    st.write(
-        "**Disclaimers:** Estimates only. Subject to credit approval, taxes, fees, and final dealer terms. Contact for details."
-    )
+    st.write(f"**Disclaimers:** {DISCLAIMER}")
     st.markdown("</div>", unsafe_allow_html=True)
 
     st.markdown("</div>", unsafe_allow_html=True)
 
-    vehicle_info = {
+    polling = not pdf_future.done()
+    st.fragment(render_pdf_download, run_every=POLL_INTERVAL if polling else None)(pdf_future, polling)
+
+
+def customer_quote_document(
+    selected_options: List[QuoteOption],
+    tax_rate: float,
+    base_down: float,
+) -> QuoteDocument:
+    """Price the customer quote sheet for the current vehicle and customer."""
+    page = QuotePage(
+        st.session_state.get("customer_name", "N/A"),
+        quote_vehicle_info(),
+        list(selected_options),
+        tax_rate,
+        down_payment_ladder(base_down),
+    )
+    return build_quote_document(page)
+
+
+def start_quote_pdf(quote_doc: QuoteDocument) -> Future:
+    """Queue the PDF of a priced customer quote sheet.
+
+    Each session keeps one PDF in the queue: when a different one is
+    requested the session releases the earlier render, which is cancelled if
+    it is still queued and no other session is waiting on it.
+    """
+    owner = st.session_state.setdefault("pdf_owner", uuid.uuid4().hex)
+    pdf_future = submit_quote_pdf(quote_doc, owner)
+    previous = st.session_state.get("pdf_future")
+    if previous is not None and previous is not pdf_future:
+        release_quote_pdf(previous, owner)
+    st.session_state.pdf_future = pdf_future
+    return pdf_future
+
+
+def quote_vehicle_info() -> Dict[str, Any]:
+    """Return the vehicle details printed on the customer quote."""
+    return {
         "year": st.session_state.get("model_year", "N/A"),
         "make": st.session_state.get("make", "N/A"),
         "model": st.session_state.get("model", "N/A"),
@@ -343,20 +434,24 @@ def render_customer_quote_page(
         "msrp": st.session_state.get("msrp", 0.0),
         "vin": st.session_state.get("vin", "N/A"),
     }
+
+
+def render_pdf_download(pdf_future: Future, polling: bool) -> None:
+    """Show the PDF download button once the background render has finished."""
+    if not pdf_future.done():
+        st.caption("\u23f3 Preparing PDF...")
+        return
+    if polling:
+        # Rerun the page so the fragment is recreated without the poll timer.
+        st.rerun()
     try:
-        pdf_buffer = generate_quote_pdf(
-            selected_options,
-            tax_rate,
-            base_down,
-            customer_name,
-            vehicle_info,
-        )
-    except RuntimeError as e:
-        st.error(str(e))
+        pdf_bytes = pdf_future.result()
+    except Exception as e:
+        st.error(str(e) or "Failed to generate PDF")
     else:
         st.download_button(
             "Download Quote PDF",
-            pdf_buffer,
+            pdf_bytes,
             "lease_quote.pdf",
             "application/pdf",
             key="export_pdf_main",
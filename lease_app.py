@@ -1,21 +1,37 @@
 import streamlit as st
-import pandas as pd
-from utils import sort_quote_options, calculate_option_payment
-from data_loader import load_data
+from utils import sort_quote_options, calculate_option_payments, solve_for_target_payment
+from data_loader import (
+    get_data_store,
+    load_snapshot,
+    lookup_programs,
+    lookup_vehicle,
+    vin_model_year,
+)
 from layout_sections import (
+    DATA_CHECK_INTERVAL,
+    check_data_version,
     render_header,
     render_right_sidebar,
     render_quote_card,
+    financial_settings,
+    selected_quote_options,
     render_vin_scanner_button,
     render_customer_quote_page,
+    customer_quote_document,
+    start_quote_pdf,
+    recognize_vin_photo,
 )
 from utils import sort_quote_options
 from style import BASE_CSS
-from pdf_utils import generate_quote_pdf
+from quote_grid import get_quote_grid, quote_options_from_grid
+from pdf_utils import prewarm_pdf_renderer
+from vin_recognition import resolve_vin
 
 def main() -> None:
     st.set_page_config(page_title="Lease Quote Tool", layout="wide", initial_sidebar_state="auto")
     st.markdown(BASE_CSS, unsafe_allow_html=True)
+    # Load PDF fonts and styles in the background so the first print is fast.
+    prewarm_pdf_renderer()
 
     if 'selected_quotes' not in st.session_state:
         st.session_state.selected_quotes = set()
@@ -30,11 +46,21 @@ def main() -> None:
 
     with st.spinner("Loading data..."):
         try:
-            lease_programs, vehicle_data, county_tax_rates = load_data()
+            # One shared, read-only snapshot for the whole run; nothing is copied per session.
+            data = load_snapshot()
+            program_index, vehicle_index = data.program_index, data.vehicle_index
+            county_tax_rates = data.county_tax_rates
         except FileNotFoundError:
             st.error("⚠️ Data files not found. Please ensure required files are present.")
             st.stop()
 
+    # Reload changed data files in the background.
+    get_data_store().watch()
+    if st.session_state.get('data_version', data.version) != data.version:
+        st.toast("🔄 Lease programs and inventory were updated.")
+    st.session_state.data_version = data.version
+    st.fragment(check_data_version, run_every=DATA_CHECK_INTERVAL)()
+
     # Left Sidebar
     with st.sidebar:
         st.header("Vehicle & Customer Info")
@@ -59,7 +85,7 @@ def main() -> None:
             # Updated VIN scanner with camera input
             vin_photo = st.camera_input("Scan VIN (or upload)", help="Use camera for quick VIN capture")
             if vin_photo:
-                vin = extract_vin_from_image(vin_photo)
+                vin = recognize_vin_photo(vin_photo, vehicle_index)
                 if vin:
                     st.success(f"✅ VIN Detected: {vin}")
                     st.session_state.vin_input = vin
@@ -72,19 +98,16 @@ def main() -> None:
             if vin_input and len(vin_input) != 17:
                 st.warning("⚠️ VIN should be 17 characters.")
             if vin_input:
-                vin_data = vehicle_data[vehicle_data["VIN"] == vin_input]
-                if not vin_data.empty:
-                    vehicle = vin_data.iloc[0]
-                    msrp_value = vehicle.get("MSRP", 0)
-                    try:
-                        msrp_display = float(str(msrp_value).replace("$", "").replace(",", ""))
-                    except (TypeError, ValueError):
-                        msrp_display = 0.0
+                vehicle = lookup_vehicle(vehicle_index, vin_input)
+                if vehicle:
                     st.success("✅ Vehicle Found!")
-                    st.write(f"**Model:** {vehicle.get('ModelNumber', 'N/A')}")
-                    st.write(f"**MSRP:** ${msrp_display:,.2f}")
+                    st.write(f"**Model:** {vehicle.model_number or 'N/A'}")
+                    st.write(f"**MSRP:** ${vehicle.msrp:,.2f}")
                 else:
                     st.warning("❌ Vehicle not found in inventory")
+                    suggestion = resolve_vin(vin_input.strip(), vehicle_index)
+                    if suggestion in vehicle_index:
+                        st.info(f"Did you mean {suggestion}?")
 
             selected_tier = st.selectbox("Credit Tier:", [f"Tier {i}" for i in range(1, 9)], help="Higher tiers may get better rates")
             counties = sorted(county_tax_rates["County"].tolist())
@@ -97,36 +120,31 @@ def main() -> None:
         st.info("👈 Enter a VIN number in the sidebar to get started")
         st.stop()
 
-    vin_data = vehicle_data[vehicle_data["VIN"] == vin_input]
-    if vin_data.empty:
+    vehicle = lookup_vehicle(vehicle_index, vin_input)
+    if vehicle is None:
         st.error("❌ Vehicle not found in inventory. Please check the VIN number.")
         st.stop()
 
-    vehicle = vin_data.iloc[0]
-    model_number = vehicle["ModelNumber"]
-    msrp_raw = vehicle.get("MSRP", 0)
-    try:
-        msrp = float(str(msrp_raw).replace("$", "").replace(",", ""))
-    except (TypeError, ValueError):
-        msrp = 0.0
+    model_number = vehicle.model_number
+    msrp = vehicle.msrp
     st.session_state.msrp = msrp
     st.session_state.vin = vin_input
 
-    lease_matches = lease_programs[lease_programs["ModelNumber"] == model_number]
-    if lease_matches.empty:
+    programs = lookup_programs(program_index, model_number, vin_model_year(vin_input))
+    if not programs:
         st.error("❌ No lease program found for this model number.")
         st.stop()
 
-    lease_info = lease_matches.iloc[0]
-    model_year = lease_info.get("Year", "N/A")
-    make = lease_info.get("Make", "Hyundai")
-    model = lease_info.get("Model")
-    trim = lease_info.get("Trim")
+    lease_info = programs[min(programs)]
+    model_year = lease_info.year
+    make = lease_info.make or "Hyundai"
+    model = lease_info.model
+    trim = lease_info.trim
 
-    if pd.isna(model):
-        model = vehicle.get("Model", "N/A")
-    if pd.isna(trim):
-        trim = vehicle.get("Trim", "N/A")
+    if model is None:
+        model = vehicle.model or "N/A"
+    if trim is None:
+        trim = vehicle.trim or "N/A"
     st.session_state.model_year = model_year
     st.session_state.make = make
     st.session_state.model = model
@@ -135,45 +153,14 @@ def main() -> None:
     # Build quote options (with spinner)
     with st.spinner("Generating quote options..."):
         tier_num = int(selected_tier.split(" ")[1])
-        mileage_options = [10000, 12000, 15000]
-        lease_terms = sorted(lease_matches["Term"].dropna().unique())
-
-        quote_options = []
-        for term in lease_terms:
-            term_group = lease_matches[lease_matches["Term"] == term]
-            for mileage in mileage_options:
-                row = term_group.iloc[0]
-                base_residual = float(row["Residual"])
-                adjusted_residual = (
-                    base_residual + 0.01 if mileage == 10000 else
-                    base_residual - 0.02 if mileage == 15000 else
-                    base_residual
-                )
-                residual_value = round(msrp * adjusted_residual, 2)
-                mf_col = f"Tier {tier_num}"
-                money_factor = float(row[mf_col])
-                available_lease_cash = float(row.get("LeaseCash", 0.0))
-                quote_options.append({
-                    'term': int(term),
-                    'mileage': mileage,
-                    'residual_value': residual_value,
-                    'residual_pct': adjusted_residual * 100,  # New: For display
-                    'money_factor': money_factor + (0.0004 if st.session_state.get('apply_markup') else 0),
-                    'available_lease_cash': available_lease_cash,
-                    'selling_price': float(msrp),
-                    'lease_cash_used': 0.0,
-                    'index': len(quote_options)
-                })
+        grid = get_quote_grid(vin_input, programs, msrp, tax_rate)
+        quote_options = quote_options_from_grid(grid, tier_num, st.session_state.get('apply_markup'))
 
     st.session_state.quote_options = quote_options
 
     if st.session_state.page == 'print':
-        selected = [
-            opt for opt in st.session_state.quote_options
-            if f"{opt['term']}_{opt['mileage']}_{opt['index']}" in st.session_state.selected_quotes
-        ]
         render_customer_quote_page(
-            selected[:4],
+            selected_quote_options(st.session_state.quote_options),
             st.session_state.get('tax_rate', 0.0),
             st.session_state.get('selected_down_payment',
                                 st.session_state.get('default_money_down', 0.0)),
@@ -184,45 +171,40 @@ def main() -> None:
     main_col, right_col = st.columns([2.5, 1], gap="large")
 
     with right_col:
-        (
-            trade_value,
-            default_money_down,
-            sort_by,
-            term_filter,
-            mileage_filter,
-            create_quote_clicked,
-            apply_markup,
-        ) = render_right_sidebar(quote_options)
-        st.session_state.apply_markup = apply_markup
-        if create_quote_clicked:
-            st.session_state.selected_down_payment = default_money_down
-            st.session_state.page = 'print'
+        # Settings and cards are fragments: their widgets rerun only themselves.
+        st.fragment(render_right_sidebar)(quote_options)
+    trade_value, default_money_down, sort_by, term_filter, mileage_filter, target_payment = financial_settings()
 
     with main_col:
         render_header(model_year, make, model, trim, msrp, vin_input)
 
-        filtered_options = [opt for opt in quote_options if opt['term'] in term_filter and opt['mileage'] in mileage_filter]
+        filtered_options = [opt for opt in quote_options if opt.term in term_filter and opt.mileage in mileage_filter]
         filtered_options = sort_quote_options(filtered_options, sort_by, trade_value, default_money_down, tax_rate)
 
         # Highlight lowest payment
+        is_lowest = [False] * len(filtered_options)
+        cash_needed = [None] * len(filtered_options)
         if filtered_options:
-            min_payment = min(opt['payment'] for opt in [calculate_option_payment(
-                o['selling_price'], o['lease_cash_used'], o['residual_value'],
-                o['money_factor'], o['term'], trade_value, default_money_down, tax_rate
-            ) for o in filtered_options])
-            for opt in filtered_options:
-                payment_data = calculate_option_payment(
-                    opt['selling_price'], opt['lease_cash_used'], opt['residual_value'],
-                    opt['money_factor'], opt['term'], trade_value, default_money_down, tax_rate
-                )
-                opt['is_lowest'] = payment_data['payment'] == min_payment
+            payments = calculate_option_payments(
+                filtered_options, trade_value, default_money_down, tax_rate
+            )['payment']
+            is_lowest = (payments == payments.min()).tolist()
+            if target_payment:
+                cash_needed = solve_for_target_payment(
+                    filtered_options, target_payment, trade_value, default_money_down, tax_rate
+                ).tolist()
 
         st.subheader(f"Available Lease Options ({len(filtered_options)} options)")
+        render_card = st.fragment(render_quote_card)
         cols = st.columns(3 if st.session_state.get('screen_width', 1024) > 1023 else 2 if st.session_state.get('screen_width', 1024) > 767 else 1)
         for i, option in enumerate(filtered_options):
             with cols[i % len(cols)]:
-                option_key = f"{option['term']}_{option['mileage']}_{option['index']}"
-                render_quote_card(option, option_key, trade_value, default_money_down, tax_rate)
+                render_card(option, trade_value, default_money_down, tax_rate, is_lowest[i], cash_needed[i])
+
+        # Start rendering the customer PDF now so it is ready when the print page opens.
+        selected = selected_quote_options(quote_options)
+        if selected:
+            start_quote_pdf(customer_quote_document(selected, tax_rate, default_money_down))
 
     st.markdown(
         '<style>.st-emotion-cache-13ejsyy { background-color: #f0f2f6; padding: 1rem; border-radius: 0.5rem; }</style>',
@@ -1,5 +1,7 @@
 # lease_calculations.py
 
+import numpy as np
+
 def calculate_ccr_full(SP, B, rebates, TV, K, M, Q, RES, F, W, τ):
     S = SP
     U = 0.00
@@ -71,3 +73,150 @@ def calculate_payment_from_ccr(S, CCR, RES, W, F, τ, M, Q=0.0):
         "Cap Cost (S + M)": round(cap_cost, 2),
         "Tax Calculation": f"{round(BP, 6)} * {round(τ, 6)} = {round(ST, 6)}"
     }
+
+
+def _top_val_offset(S, M, Q, RES, F, W, τ, U=0.0):
+    """Return the part of topVal that calculate_ccr_full subtracts from B - K."""
+    return (
+        F * (S + M + Q + τ * (F * W * (S + M - U + RES) + (S + M - U - RES)) - U + RES) +
+        (S + M + Q + τ * (F * W * (S + M - U + RES) + (S + M - U - RES)) - U - RES) / W
+    )
+
+
+def _top_val_slope(F, W, τ):
+    """Return d(offset)/dS; _top_val_offset is linear in the selling price."""
+    return (1 + τ * (F * W + 1)) * (F + 1 / W)
+
+
+def _bottom_val(F, W, τ):
+    return (1 + τ) * (1 - (F + 1 / W)) - τ * F * (1 + F * W)
+
+
+def _payment_components(S, CCR, RES, W, F, τ, M, Q):
+    """Return unrounded (BP, ST, MP) exactly as calculate_payment_from_ccr computes them."""
+    adjusted_cap_cost = S + M - CCR
+    BP = (adjusted_cap_cost - RES) / W + F * (adjusted_cap_cost + RES)
+    ST = (BP * τ) * W
+    TA = S + Q + ST + M - CCR
+    MP = (TA - RES) / W + F * (TA + RES)
+    return BP, ST, MP
+
+
+def solve_option_quote(SP, B, RES, F, W, τ, trade, cash, M=962.50, Q=0.0):
+    """Price one lease option with a single evaluation of the topVal expression.
+
+    Closed-form replacement for calling calculate_ccr_full twice. The first
+    call only finds the overflow that trade and cash must fill; the second
+    re-evaluates topVal after the unused trade lowers the selling price.
+    Because topVal is linear in S, the second value is the first one shifted
+    by the slope times the unused trade.
+
+    Rounding always uses np.round, as calculate_quote_batch does, so a tie
+    rounds the same way whether the inputs are Python or numpy floats.
+    """
+    K = 0.0
+    offset = _top_val_offset(SP, M, Q, RES, F, W, τ)
+    topVal_initial = np.round(B - K - offset, 6)
+    overflow = abs(topVal_initial) if topVal_initial < 0 else 0.0
+    trade_used = min(trade, overflow)
+    cash_used = min(cash, overflow - trade_used)
+    remaining_trade = trade - trade_used
+    remaining_cash = cash - cash_used
+    S = SP - remaining_trade
+
+    topVal = B + trade_used + cash_used + remaining_cash - K - (
+        offset - _top_val_slope(F, W, τ) * remaining_trade
+    )
+    CCR = topVal / _bottom_val(F, W, τ)
+    ccr = 0.0 if topVal < 0 or CCR < 0 else np.round(CCR, 6)
+
+    BP, ST, MP = _payment_components(S, ccr, RES, W, F, τ, M, Q)
+    return {
+        'payment': np.round(MP, 2),
+        'base_payment': np.round(BP, 2),
+        'tax_payment': np.round(ST, 2),
+        'ccr': ccr,
+        'trade_used': trade_used,
+        'remaining_cash': remaining_cash,
+    }
+
+
+def calculate_quote_batch(SP, B, RES, F, W, τ, trade, cash, M=962.50, Q=0.0):
+    """Vectorized equivalent of solve_option_quote.
+
+    Every argument may be a scalar or an array; they are broadcast against
+    each other and all outputs share the broadcast shape. The arithmetic is
+    the same expression for expression, so results match the scalar solver
+    exactly, including the intermediate rounding of TopVal and CCR.
+    """
+    SP, B, RES, F, W, τ, trade, cash = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (SP, B, RES, F, W, τ, trade, cash))
+    )
+    K = 0.0
+    offset = _top_val_offset(SP, M, Q, RES, F, W, τ)
+    topVal_initial = np.round(B - K - offset, 6)
+    overflow = np.where(topVal_initial < 0, np.abs(topVal_initial), 0.0)
+    trade_used = np.minimum(trade, overflow)
+    cash_used = np.minimum(cash, overflow - trade_used)
+    remaining_trade = trade - trade_used
+    remaining_cash = cash - cash_used
+    S = SP - remaining_trade
+
+    topVal = B + trade_used + cash_used + remaining_cash - K - (
+        offset - _top_val_slope(F, W, τ) * remaining_trade
+    )
+    CCR = topVal / _bottom_val(F, W, τ)
+    ccr = np.where((topVal < 0) | (CCR < 0), 0.0, np.round(CCR, 6))
+
+    BP, ST, MP = _payment_components(S, ccr, RES, W, F, τ, M, Q)
+    return {
+        'payment': np.round(MP, 2),
+        'base_payment': np.round(BP, 2),
+        'tax_payment': np.round(ST, 2),
+        'ccr': ccr,
+        'trade_used': trade_used,
+        'remaining_cash': remaining_cash,
+    }
+
+
+def solve_cash_down_batch(SP, B, RES, F, W, τ, trade, target, M=962.50, Q=0.0):
+    """Return the smallest cash down, to the cent, that brings the payment to ``target``.
+
+    Inverse of calculate_quote_batch for the cash argument. Cash first fills
+    the negative topVal gap and then raises CCR one for one with topVal, and
+    the payment falls by the topVal slope per dollar of CCR, so the answer
+    is closed form. A final check against calculate_quote_batch absorbs the
+    intermediate rounding.
+    """
+    SP, B, RES, F, W, τ, trade, target = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (SP, B, RES, F, W, τ, trade, target))
+    )
+    K = 0.0
+    offset = _top_val_offset(SP, M, Q, RES, F, W, τ)
+    topVal_initial = np.round(B - K - offset, 6)
+    overflow = np.where(topVal_initial < 0, np.abs(topVal_initial), 0.0)
+    trade_used = np.minimum(trade, overflow)
+    remaining_trade = trade - trade_used
+    S = SP - remaining_trade
+    slope = _top_val_slope(F, W, τ)
+
+    topVal_without_cash = B + trade_used - K - (offset - slope * remaining_trade)
+    _, _, MP_without_ccr = _payment_components(S, 0.0, RES, W, F, τ, M, Q)
+    # Any payment below target + half a cent still rounds to the target.
+    ccr_needed = (MP_without_ccr - (target + 0.005)) / slope
+    cash = np.where(
+        ccr_needed > 0,
+        np.maximum(ccr_needed * _bottom_val(F, W, τ) - topVal_without_cash, 0.0),
+        0.0,
+    )
+    cash = np.ceil(np.round(cash * 100, 6)) / 100
+
+    def payment_at(cash):
+        return calculate_quote_batch(SP, B, RES, F, W, τ, trade, cash, M, Q)['payment']
+
+    for _ in range(2):
+        cash = np.where(payment_at(cash) > target, cash + 0.01, cash)
+    for _ in range(2):
+        lower = np.maximum(cash - 0.01, 0.0)
+        cash = np.where((cash > 0) & (payment_at(lower) <= target), lower, cash)
+    return cash
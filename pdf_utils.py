@@ -1,12 +1,16 @@
 import os
+import hashlib
+import json
 import logging
-from datetime import datetime
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from io import BytesIO
 
 
 logger = logging.getLogger(__name__)
 try:
-    from weasyprint import HTML
+    from weasyprint import CSS, HTML
+    from weasyprint.text.fonts import FontConfiguration
     _WEASYPRINT_AVAILABLE = True
 except Exception as exc:  # ImportError or OSError when native libs are missing
     _WEASYPRINT_AVAILABLE = False
@@ -14,87 +18,220 @@ except Exception as exc:  # ImportError or OSError when native libs are missing
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from utils import calculate_option_payment
+from reportlab.platypus import PageBreak, SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from quote_document import (
+    DEALERSHIP,
+    DISCLAIMER,
+    SIGNATURE_LINE,
+    QuoteDocument,
+    QuotePage,
+    build_quote_document,
+    down_payment_ladder,
+    quote_page_html,
+    quote_table_rows,
+)
+from utils import LRUCache
+
+PDF_CACHE_SIZE = 64
+PDF_CACHE = LRUCache(PDF_CACHE_SIZE)
+# Renders allowed at once in this process; further requests wait in the queue.
+PDF_RENDER_WORKERS = 2
+
+QUOTE_CSS = """
+body, table, th, td {
+    font-family: Arial, sans-serif;
+    font-size: 15px;
+}
+table.lease-table {
+    width: 100%;
+    border-collapse: collapse;
+    margin-top: 12px;
+}
+.lease-table th {
+    text-align: left;
+    background-color: #f5f5f5;
+    font-weight: 600;
+    padding: 10px;
+    border-bottom: 1px solid #ccc;
+}
+.lease-table td {
+    padding: 10px;
+    vertical-align: middle;
+}
+.quote-page {
+    page-break-after: always;
+}
+.quote-page:last-child {
+    page-break-after: auto;
+}
+"""
+
+# Parsed stylesheet and font configuration, created once per process.
+_renderer = None
+_renderer_lock = threading.Lock()
+# The font configuration wraps fontconfig and pango state that is not safe to
+# use from two threads at once, so WeasyPrint layouts run one at a time.
+_weasyprint_lock = threading.Lock()
+_prewarm_started = False
+
+_render_pool = ThreadPoolExecutor(max_workers=PDF_RENDER_WORKERS, thread_name_prefix="pdf-render")
+_pending = {}
+# Owners still waiting on each pending render; see release_quote_pdf.
+_pending_owners = {}
+_pending_lock = threading.Lock()
+
+
+def _weasyprint_renderer():
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            font_config = FontConfiguration()
+            _renderer = (CSS(string=QUOTE_CSS, font_config=font_config), font_config)
+    return _renderer
+
+
+def prewarm_pdf_renderer(background: bool = True) -> None:
+    """Parse the quote stylesheet and load fonts before the first quote is printed.
+
+    Only the first call does anything; with ``background`` the work runs in a
+    daemon thread so the caller is not blocked.
+    """
+    global _prewarm_started
+    with _renderer_lock:
+        if _prewarm_started or not _WEASYPRINT_AVAILABLE:
+            return
+        _prewarm_started = True
+
+    def warm():
+        try:
+            stylesheet, font_config = _weasyprint_renderer()
+            html = HTML(string="<p>Lease Quote Summary</p>")
+            with _weasyprint_lock:
+                html.write_pdf(stylesheets=[stylesheet], font_config=font_config)
+        except Exception as e:
+            logger.warning("Failed to prewarm WeasyPrint: %s", e)
+
+    if background:
+        threading.Thread(target=warm, name="pdf-prewarm", daemon=True).start()
+    else:
+        warm()
+
+
+def quote_pdf_key(doc: QuoteDocument) -> str:
+    """Return a content hash of the text that ends up in a quote PDF."""
+    content = doc._replace(payments=None)._asdict()
+    encoded = json.dumps(content, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def submit_quote_pdf(doc: QuoteDocument, owner=None) -> Future:
+    """Queue an already priced quote sheet for rendering and return a Future resolving to its bytes.
+
+    Quotes that are already cached resolve immediately, and identical
+    requests made while a render is in flight share that render. ``owner``,
+    e.g. a session id, may later give the request up with release_quote_pdf;
+    a request without an owner keeps the render alive until it finishes.
+    """
+    key = quote_pdf_key(doc)
+    owner = object() if owner is None else owner
+    with _pending_lock:
+        future = _pending.get(key)
+        if future is not None:
+            _pending_owners[key].add(owner)
+            return future
+        pdf_bytes = PDF_CACHE.get(key)
+        if pdf_bytes is not None:
+            future = Future()
+            future.set_result(pdf_bytes)
+            return future
+        future = _render_pool.submit(_render_and_cache, key, doc)
+        _pending[key] = future
+        _pending_owners[key] = {owner}
+    return future
+
+
+def release_quote_pdf(future: Future, owner) -> bool:
+    """Give up ``owner``'s request for a render, e.g. a superseded prefetch.
+
+    The render is cancelled only when no other owner is waiting on it and it
+    is still queued; one that has already started is left to finish and
+    fill the cache. Returns True if the render was cancelled.
+    """
+    with _pending_lock:
+        key = next((key for key, pending in _pending.items() if pending is future), None)
+        if key is None:
+            return False
+        owners = _pending_owners[key]
+        owners.discard(owner)
+        if owners or not future.cancel():
+            return False
+        del _pending[key], _pending_owners[key]
+    return True
+
+
+def _render_and_cache(key, doc):
+    try:
+        pdf_bytes = render_quote_documents([doc])
+        PDF_CACHE.put(key, pdf_bytes)
+        return pdf_bytes
+    finally:
+        with _pending_lock:
+            _pending.pop(key, None)
+            _pending_owners.pop(key, None)
 
 
 def generate_quote_pdf(selected_options, tax_rate, base_down, customer_name, vehicle_info):
-    """Generate a PDF from an HTML representation of the quote."""
-    year = vehicle_info.get("year", "N/A")
-    make = vehicle_info.get("make", "N/A")
-    model = vehicle_info.get("model", "N/A")
-    trim = vehicle_info.get("trim", "N/A")
-    msrp = vehicle_info.get("msrp", 0.0)
-    vin = vehicle_info.get("vin", "N/A")
-
-    header_html = "<table class='lease-table'><tr><th>Down Payment</th>"
-    for opt in selected_options:
-        header_html += f"<th>{opt['term']} Mo | {opt['mileage']:,} mi/yr</th>"
-    header_html += "</tr>"
-
-    body_html = ""
-    default_rows = [base_down + 1500 * i for i in range(3)]
-    for down_val in default_rows:
-        body_html += "<tr>"
-        body_html += f"<td><strong>${down_val:,.2f} Down</strong></td>"
-        for opt in selected_options:
-            payment_data = calculate_option_payment(
-                opt['selling_price'],
-                opt['lease_cash_used'],
-                opt['residual_value'],
-                opt['money_factor'],
-                opt['term'],
-                0.0,
-                down_val,
-                tax_rate,
-            )
-            payment = payment_data['payment']
-            body_html += f"<td>☐ ${payment:,.2f}/mo</td>"
-        body_html += "</tr>"
+    """Return the quote PDF as bytes, reusing an identical earlier render."""
+    page = QuotePage(customer_name, dict(vehicle_info), list(selected_options), tax_rate, down_payment_ladder(base_down))
+    return submit_quote_pdf(build_quote_document(page)).result()
+
+
+def _quote_page_flowables(doc, styles):
+    table = Table(quote_table_rows(doc), hAlign="LEFT")
+    table.setStyle(
+        TableStyle(
+            [
+                ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+                ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
+                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ]
+        )
+    )
+    return [
+        Paragraph("Lease Quote Summary", styles["Title"]),
+        Paragraph(f"Customer: {doc.customer_name}", styles["Normal"]),
+        Paragraph(f"Vehicle: {doc.vehicle_summary}", styles["Normal"]),
+        Paragraph(f"Dealership: {DEALERSHIP} | Date: {doc.date_str}", styles["Normal"]),
+        table,
+        Spacer(1, 12),
+        Paragraph(SIGNATURE_LINE, styles["Normal"]),
+        Paragraph(f"Disclaimers: {DISCLAIMER}", styles["Normal"]),
+    ]
+
+
+def render_quote_pages(pages, date_str=None):
+    """Render quote pages into one PDF, one page per QuotePage, and return its bytes."""
+    return render_quote_documents([build_quote_document(page, date_str) for page in pages])
 
-    footer_html = "</table>"
 
-    html_content = f"""
+def render_quote_documents(docs):
+    """Render priced quote sheets into one PDF, one page per QuoteDocument, and return its bytes."""
+    if _WEASYPRINT_AVAILABLE:
+        html_content = f"""
     <html>
     <head>
         <meta charset='utf-8'>
-        <style>
-        body, table, th, td {{
-            font-family: Arial, sans-serif;
-            font-size: 15px;
-        }}
-        table.lease-table {{
-            width: 100%;
-            border-collapse: collapse;
-            margin-top: 12px;
-        }}
-        .lease-table th {{
-            text-align: left;
-            background-color: #f5f5f5;
-            font-weight: 600;
-            padding: 10px;
-            border-bottom: 1px solid #ccc;
-        }}
-        .lease-table td {{
-            padding: 10px;
-            vertical-align: middle;
-        }}
-        </style>
     </head>
     <body>
-        <h2>Lease Quote Summary</h2>
-        <p>Customer: {customer_name}</p>
-        <p>Vehicle: {year} {make} {model} {trim} | MSRP: ${msrp:,.2f} | VIN: {vin}</p>
-        <p>Dealership: Mathew's Hyundai | Date: {datetime.today().strftime('%B %d, %Y')}</p>
-        {header_html + body_html + footer_html}
-        <p>Customer Signature: _______________________________ Date: _______________</p>
-        <p style='font-size:12px;'>Disclaimers: Estimates only. Subject to credit approval, taxes, fees, and final dealer terms. Contact for details.</p>
+        {"".join(map(quote_page_html, docs))}
     </body>
     </html>
     """
-    if _WEASYPRINT_AVAILABLE:
         try:
-            return HTML(string=html_content, base_url=os.getcwd()).write_pdf()
+            stylesheet, font_config = _weasyprint_renderer()
+            html = HTML(string=html_content, base_url=os.getcwd())
+            with _weasyprint_lock:
+                return html.write_pdf(stylesheets=[stylesheet], font_config=font_config)
         except Exception as e:
             logger.error("Failed to generate PDF using WeasyPrint: %s", e)
             logger.debug(
@@ -107,68 +244,14 @@ def generate_quote_pdf(selected_options, tax_rate, base_down, customer_name, veh
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter)
     styles = getSampleStyleSheet()
-
-    elements = [
-        Paragraph("Lease Quote Summary", styles["Title"]),
-        Paragraph(f"Customer: {customer_name}", styles["Normal"]),
-        Paragraph(
-            f"Vehicle: {year} {make} {model} {trim} | MSRP: ${msrp:,.2f} | VIN: {vin}",
-            styles["Normal"],
-        ),
-        Paragraph(
-            f"Dealership: Mathew's Hyundai | Date: {datetime.today().strftime('%B %d, %Y')}",
-            styles["Normal"],
-        ),
-    ]
-
-    header_row = ["Down Payment"] + [
-        f"{opt['term']} Mo | {opt['mileage']:,} mi/yr" for opt in selected_options
-    ]
-    table_data = [header_row]
-
-    for down_val in default_rows:
-        row = [f"${down_val:,.2f} Down"]
-        for opt in selected_options:
-            payment_data = calculate_option_payment(
-                opt['selling_price'],
-                opt['lease_cash_used'],
-                opt['residual_value'],
-                opt['money_factor'],
-                opt['term'],
-                0.0,
-                down_val,
-                tax_rate,
-            )
-            payment = payment_data['payment']
-            row.append(f"☐ ${payment:,.2f}/mo")
-        table_data.append(row)
-
-    table = Table(table_data, hAlign="LEFT")
-    table.setStyle(
-        TableStyle(
-            [
-                ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-                ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
-                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-            ]
-        )
-    )
-
-    elements.append(table)
-    elements.append(Spacer(1, 12))
-    elements.append(
-        Paragraph(
-            "Customer Signature: _______________________________ Date: ____________",
-            styles["Normal"],
-        )
-    )
-    elements.append(
-        Paragraph(
-            "Disclaimers: Estimates only. Subject to credit approval, taxes, fees, and final dealer terms. Contact for details.",
-            styles["Normal"],
-        )
-    )
-
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
+    elements = []
+    for quote_doc in docs:
+        if elements:
+            elements.append(PageBreak())
+        elements.extend(_quote_page_flowables(quote_doc, styles))
+    try:
+        doc.build(elements)
+    except Exception as e:
+        logger.error("Failed to generate PDF using ReportLab: %s", e)
+        raise RuntimeError("Failed to generate PDF") from e
+    return buffer.getvalue()
@@ -0,0 +1,112 @@
+"""Customer quote sheet model shared by the print page and both PDF backends.
+
+A QuoteDocument carries the payment matrix for every down payment row and
+selected option, computed once, plus the text each renderer needs. The HTML
+templates below are formatted once per row and cell instead of being rebuilt
+by string concatenation in each renderer.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from quote_grid import QuoteOption
+from utils import calculate_option_payments
+
+DOWN_PAYMENT_STEP = 1500
+DOWN_PAYMENT_ROWS = 3
+DEALERSHIP = "Mathew's Hyundai"
+SIGNATURE_LINE = "Customer Signature: _______________________________ Date: _______________"
+DISCLAIMER = "Estimates only. Subject to credit approval, taxes, fees, and final dealer terms. Contact for details."
+
+_TABLE_HTML = "<table class='lease-table'><tr><th>Down Payment</th>{headers}</tr>{rows}</table>"
+_HEADER_HTML = "<th>{}</th>"
+_ROW_HTML = "<tr><td><strong>{down}</strong></td>{cells}</tr>"
+_CELL_HTML = "<td>{}</td>"
+_PAGE_HTML = """
+    <section class='quote-page'>
+        <h2>Lease Quote Summary</h2>
+        <p>Customer: {customer}</p>
+        <p>Vehicle: {vehicle}</p>
+        <p>Dealership: {dealership} | Date: {date}</p>
+        {table}
+        <p>{signature}</p>
+        <p style='font-size:12px;'>Disclaimers: {disclaimer}</p>
+    </section>
+    """
+
+
+class QuotePage(NamedTuple):
+    """One customer quote sheet: a vehicle, its chosen options and down payment rows."""
+    customer_name: str
+    vehicle_info: Dict[str, Any]
+    selected_options: List[QuoteOption]
+    tax_rate: float
+    down_payments: List[float]
+
+
+class QuoteDocument(NamedTuple):
+    """A QuotePage with its payments priced and labels formatted."""
+    customer_name: str
+    vehicle_summary: str
+    date_str: str
+    option_labels: List[str]
+    down_labels: List[str]
+    payments: np.ndarray          # (down payment row, option)
+    payment_labels: List[List[str]]
+
+
+def down_payment_ladder(base_down, step=DOWN_PAYMENT_STEP, rows=DOWN_PAYMENT_ROWS):
+    """Return the down payment rows printed on a quote sheet."""
+    return [base_down + step * i for i in range(rows)]
+
+
+def build_quote_document(page: QuotePage, date_str: Optional[str] = None) -> QuoteDocument:
+    """Price every down payment row against every option in one vectorized call."""
+    info = page.vehicle_info
+    payments = calculate_option_payments(
+        page.selected_options, 0.0, np.array(page.down_payments, dtype=float)[:, None], page.tax_rate
+    )['payment']
+    return QuoteDocument(
+        customer_name=page.customer_name,
+        vehicle_summary=(
+            f"{info.get('year', 'N/A')} {info.get('make', 'N/A')} {info.get('model', 'N/A')} "
+            f"{info.get('trim', 'N/A')} | MSRP: ${info.get('msrp', 0.0):,.2f} | VIN: {info.get('vin', 'N/A')}"
+        ),
+        date_str=date_str or datetime.today().strftime('%B %d, %Y'),
+        option_labels=[f"{opt.term} Mo | {opt.mileage:,} mi/yr" for opt in page.selected_options],
+        down_labels=[f"${down_val:,.2f} Down" for down_val in page.down_payments],
+        payments=payments,
+        payment_labels=[[f"☐ ${payment:,.2f}/mo" for payment in row] for row in payments.tolist()],
+    )
+
+
+def quote_table_html(doc: QuoteDocument) -> str:
+    """Render the down payment by option table used on screen and in the WeasyPrint PDF."""
+    return _TABLE_HTML.format(
+        headers="".join(map(_HEADER_HTML.format, doc.option_labels)),
+        rows="".join(
+            _ROW_HTML.format(down=down, cells="".join(map(_CELL_HTML.format, cells)))
+            for down, cells in zip(doc.down_labels, doc.payment_labels)
+        ),
+    )
+
+
+def quote_page_html(doc: QuoteDocument) -> str:
+    """Render one printable quote sheet as an HTML section."""
+    return _PAGE_HTML.format(
+        customer=doc.customer_name,
+        vehicle=doc.vehicle_summary,
+        dealership=DEALERSHIP,
+        date=doc.date_str,
+        table=quote_table_html(doc),
+        signature=SIGNATURE_LINE,
+        disclaimer=DISCLAIMER,
+    )
+
+
+def quote_table_rows(doc: QuoteDocument) -> List[List[str]]:
+    """Return the table as rows of cell text, header first, for ReportLab."""
+    return [["Down Payment"] + doc.option_labels] + [
+        [down] + cells for down, cells in zip(doc.down_labels, doc.payment_labels)
+    ]
@@ -0,0 +1,143 @@
+import math
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from data_loader import ProgramRecord
+from lease_calculations import calculate_quote_batch
+from utils import LRUCache
+
+MILEAGE_OPTIONS = (10000, 12000, 15000)
+# Residual percentage points added for each mileage option.
+MILEAGE_RESIDUAL_ADJUSTMENTS = {10000: 0.01, 12000: 0.0, 15000: -0.02}
+MONEY_FACTOR_MARKUP = 0.0004
+TIER_COUNT = 8
+GRID_CACHE_SIZE = 256
+
+
+class QuoteGrid(NamedTuple):
+    """Every tier, term and mileage quote for one vehicle and tax rate.
+
+    Arrays indexed by markup are [without markup, with markup]. Payments
+    assume the selling price is MSRP with no lease cash and the trade and
+    cash down the grid was built with (none by default).
+    """
+    terms: Tuple[int, ...]
+    mileages: Tuple[int, ...]
+    msrp: float
+    residual_pct: np.ndarray      # (term, mileage) adjusted residual fraction
+    residual_value: np.ndarray    # (term, mileage)
+    lease_cash: np.ndarray        # (term,)
+    money_factor: np.ndarray      # (markup, tier, term), NaN without a program rate
+    base_payment: np.ndarray      # (markup, tier, term, mileage)
+    payment: np.ndarray           # (markup, tier, term, mileage)
+
+
+class QuoteOption(NamedTuple):
+    """One term and mileage quote for a credit tier, as shown on a quote card.
+
+    ``id`` is the option's position in its QuoteGrid, so it stays the same
+    when the tier or markup changes.
+    """
+    id: int
+    term: int
+    mileage: int
+    residual_value: float
+    residual_pct: float           # percent
+    money_factor: float
+    available_lease_cash: float
+    selling_price: float
+    lease_cash_used: float = 0.0
+
+
+# Shared across sessions so popular VINs are only computed once per process.
+GRID_CACHE = LRUCache(GRID_CACHE_SIZE)
+
+
+def build_quote_grid(programs: Dict[int, ProgramRecord], msrp: float, tax_rate: float,
+                     mileages=MILEAGE_OPTIONS, trade_value: float = 0.0, cash_down: float = 0.0) -> QuoteGrid:
+    """Compute a QuoteGrid from a {Term: ProgramRecord} mapping in one vectorized pass."""
+    terms = tuple(sorted(programs))
+    records = [programs[term] for term in terms]
+    residual_pct = np.array(
+        [[record.residual + MILEAGE_RESIDUAL_ADJUSTMENTS[mileage] for mileage in mileages] for record in records],
+        dtype=float,
+    ).reshape(len(terms), len(mileages))
+    # Plain round() keeps residuals identical to the per-option values used before.
+    residual_value = np.array(
+        [[round(msrp * pct, 2) for pct in row] for row in residual_pct.tolist()], dtype=float
+    ).reshape(residual_pct.shape)
+    lease_cash = np.array([record.lease_cash for record in records], dtype=float)
+
+    tier_rates = np.array([record.money_factors for record in records], dtype=float).reshape(len(terms), TIER_COUNT)
+    money_factor = np.stack([tier_rates.T, tier_rates.T + MONEY_FACTOR_MARKUP])
+
+    quotes = calculate_quote_batch(
+        SP=msrp, B=0.0, RES=residual_value, F=money_factor[..., None],
+        W=np.array(terms, dtype=float)[:, None], τ=tax_rate, trade=trade_value, cash=cash_down,
+    )
+    return QuoteGrid(
+        terms=terms,
+        mileages=tuple(mileages),
+        msrp=float(msrp),
+        residual_pct=residual_pct,
+        residual_value=residual_value,
+        lease_cash=lease_cash,
+        money_factor=money_factor,
+        base_payment=quotes['base_payment'],
+        payment=quotes['payment'],
+    )
+
+
+def _programs_key(programs: Dict[int, ProgramRecord]) -> tuple:
+    """Return the pricing inputs of a program set as a hashable cache key.
+
+    NaN money factors (tiers without a rate) become None: NaN never equals
+    itself, so a key holding it would only match the very same float
+    objects, i.e. never after a reload of unchanged data.
+    """
+    return tuple(
+        (term, record.year, record.residual, record.lease_cash,
+         tuple([mf if mf == mf else None for mf in record.money_factors]))  # mf != mf only for NaN
+        for term, record in sorted(programs.items())
+    )
+
+
+def get_quote_grid(vin: str, programs: Dict[int, ProgramRecord], msrp: float, tax_rate: float) -> QuoteGrid:
+    """Return the cached QuoteGrid for a vehicle, building it on a miss.
+
+    The key holds the program values themselves, so grids priced from an
+    older data snapshot are never returned after the programs change, while
+    a reload of unchanged data still hits the cache.
+    """
+    key = (vin, _programs_key(programs), float(msrp), float(tax_rate))
+    grid = GRID_CACHE.get(key)
+    if grid is None:
+        grid = build_quote_grid(programs, msrp, tax_rate)
+        GRID_CACHE.put(key, grid)
+    return grid
+
+
+def quote_options_from_grid(grid: QuoteGrid, tier: int, apply_markup: bool) -> List[QuoteOption]:
+    """Slice one credit tier out of the grid as QuoteOptions.
+
+    Terms without a money factor for the tier are left out.
+    """
+    money_factors = grid.money_factor[int(bool(apply_markup)), tier - 1]
+    quote_options = []
+    for t, term in enumerate(grid.terms):
+        money_factor = float(money_factors[t])
+        if math.isnan(money_factor):
+            continue
+        for m, mileage in enumerate(grid.mileages):
+            quote_options.append(QuoteOption(
+                id=t * len(grid.mileages) + m,
+                term=term,
+                mileage=mileage,
+                residual_value=float(grid.residual_value[t, m]),
+                residual_pct=float(grid.residual_pct[t, m]) * 100,
+                money_factor=money_factor,
+                available_lease_cash=float(grid.lease_cash[t]),
+                selling_price=grid.msrp,
+            ))
+    return quote_options
@@ -0,0 +1,229 @@
+"""Bulk customer quote packets.
+
+Renders a pre-filled quote sheet for every row of a customer CSV (columns
+``Customer`` and ``VIN``, optionally ``County``, ``Tier`` and ``Down``) as one
+multi-page PDF or a zip of individual PDFs:
+
+    python quote_packets.py event_customers.csv --output event_quotes.pdf
+    python quote_packets.py event_customers.csv --output event_quotes.zip --ladder 0,1000,2500,5000
+"""
+import argparse
+import os
+import re
+import sys
+import zipfile
+from datetime import datetime
+from io import BytesIO
+from multiprocessing import Pool
+from operator import attrgetter
+from typing import Iterator, List, Optional, Sequence
+
+import pandas as pd
+
+try:
+    from pypdf import PdfWriter
+    _PYPDF_AVAILABLE = True
+except ImportError:
+    _PYPDF_AVAILABLE = False
+
+from data_loader import (
+    build_program_index,
+    build_vehicle_index,
+    lookup_programs,
+    lookup_vehicle,
+    read_sources,
+    vin_model_year,
+)
+from pdf_utils import prewarm_pdf_renderer, render_quote_pages
+from quote_document import DOWN_PAYMENT_ROWS, DOWN_PAYMENT_STEP, QuotePage
+from quote_grid import TIER_COUNT, get_quote_grid, quote_options_from_grid
+from utils import sort_quote_options
+
+DEFAULT_COUNTY = "Marion"
+DEFAULT_LADDER = tuple(DOWN_PAYMENT_STEP * i for i in range(DOWN_PAYMENT_ROWS))
+DEFAULT_OPTIONS_PER_PAGE = 4  # the most the customer quote page shows
+DEFAULT_CHUNK_SIZE = 16  # pages per worker task
+
+
+def build_quote_pages(
+    customers: pd.DataFrame,
+    county: str = DEFAULT_COUNTY,
+    tier: int = 1,
+    ladder: Sequence[float] = DEFAULT_LADDER,
+    options_per_page: int = DEFAULT_OPTIONS_PER_PAGE,
+    apply_markup: bool = True,
+    mileage: Optional[int] = None,
+) -> List[QuotePage]:
+    """Build one QuotePage per customer row, skipping rows that cannot be quoted.
+
+    Each page shows the lowest-payment options for the customer's tier, with a
+    down payment row for every ``ladder`` step added to the customer's Down.
+    Raises ValueError if ``tier`` is not a credit tier.
+    """
+    if not 1 <= tier <= TIER_COUNT:
+        raise ValueError(f"Credit tier must be between 1 and {TIER_COUNT}, got {tier}")
+    lease_programs, vehicle_data, county_tax_rates = read_sources()
+    program_index = build_program_index(lease_programs)
+    vehicle_index = build_vehicle_index(vehicle_data)
+    tax_rates = dict(zip(county_tax_rates["County"], county_tax_rates["Tax Rate"] / 100.0))
+
+    pages = []
+    for row in customers.to_dict("records"):
+        vin = str(row.get("VIN") or "").strip().upper()
+        vehicle = lookup_vehicle(vehicle_index, vin)
+        programs = lookup_programs(program_index, vehicle.model_number, vin_model_year(vin)) if vehicle else None
+        if not programs or vehicle.msrp <= 0:
+            print(f"❌ Skipping {row.get('Customer')}: no vehicle or lease program for VIN {vin!r}")
+            continue
+        row_county = row.get("County") if isinstance(row.get("County"), str) else county
+        if row_county not in tax_rates:
+            print(f"❌ Skipping {row.get('Customer')}: unknown county {row_county!r}")
+            continue
+        tax_rate = tax_rates[row_county]
+        row_tier = int(row["Tier"]) if pd.notna(row.get("Tier")) else tier
+        if not 1 <= row_tier <= TIER_COUNT:
+            print(f"❌ Skipping {row.get('Customer')}: credit tier {row_tier} is not between 1 and {TIER_COUNT}")
+            continue
+        base_down = float(row["Down"]) if pd.notna(row.get("Down")) else 0.0
+
+        grid = get_quote_grid(vin, programs, vehicle.msrp, tax_rate)
+        options = quote_options_from_grid(grid, row_tier, apply_markup)
+        if not options:
+            print(f"❌ Skipping {row.get('Customer')}: no money factor for credit tier {row_tier} on VIN {vin!r}")
+            continue
+        if mileage is not None:
+            options = [opt for opt in options if opt.mileage == mileage]
+            if not options:
+                print(f"❌ Skipping {row.get('Customer')}: no {mileage:,} mi/yr option for VIN {vin!r}")
+                continue
+        options = sort_quote_options(options, "Lowest Payment", 0.0, base_down, tax_rate)[:options_per_page]
+        options.sort(key=attrgetter("term", "mileage"))
+
+        lease_info = programs[min(programs)]
+        vehicle_info = {
+            "year": lease_info.year,
+            "make": lease_info.make or "Hyundai",
+            "model": lease_info.model or vehicle.model or "N/A",
+            "trim": lease_info.trim or vehicle.trim or "N/A",
+            "msrp": vehicle.msrp,
+            "vin": vin,
+        }
+        pages.append(QuotePage(
+            customer_name=str(row.get("Customer") or "N/A"),
+            vehicle_info=vehicle_info,
+            selected_options=options,
+            tax_rate=tax_rate,
+            down_payments=[base_down + step for step in ladder],
+        ))
+    return pages
+
+
+def _init_worker() -> None:
+    # Parse the stylesheet and load fonts once per worker process.
+    prewarm_pdf_renderer(background=False)
+
+
+def _render_chunk(args) -> bytes:
+    pages, date_str = args
+    return render_quote_pages(pages, date_str)
+
+
+def _merge_pdfs(parts: List[bytes]) -> bytes:
+    writer = PdfWriter()
+    for part in parts:
+        writer.append(BytesIO(part))
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def render_pdf_parts(
+    pages: Sequence[QuotePage],
+    pages_per_part: int,
+    workers: Optional[int] = None,
+    date_str: Optional[str] = None,
+) -> Iterator[bytes]:
+    """Render ``pages`` across a process pool, yielding one PDF per ``pages_per_part`` pages in order."""
+    date_str = date_str or datetime.today().strftime('%B %d, %Y')
+    tasks = [(pages[i:i + pages_per_part], date_str) for i in range(0, len(pages), pages_per_part)]
+    with Pool(processes=workers, initializer=_init_worker) as pool:
+        yield from pool.imap(_render_chunk, tasks)
+
+
+def write_packet(
+    pages: Sequence[QuotePage],
+    output: str,
+    fmt: str,
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> int:
+    """Write ``pages`` to ``output`` as one PDF or a zip of PDFs and return the page count.
+
+    A PDF of more than ``chunk_size`` pages is rendered in parts and merged
+    with pypdf; RuntimeError is raised before rendering if pypdf is missing.
+    """
+    if fmt == "zip":
+        with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for i, (page, pdf_bytes) in enumerate(zip(pages, render_pdf_parts(pages, 1, workers))):
+                name = re.sub(r"[^A-Za-z0-9]+", "_", page.customer_name).strip("_") or "customer"
+                archive.writestr(f"{i + 1:04d}_{name}_{page.vehicle_info['vin']}.pdf", pdf_bytes)
+        return len(pages)
+
+    if len(pages) > chunk_size and not _PYPDF_AVAILABLE:
+        raise RuntimeError(
+            f"pypdf is needed to merge {len(pages)} quote sheets rendered {chunk_size} at a time; "
+            "install it with `pip install pypdf` or write a zip with --format zip"
+        )
+    parts = list(render_pdf_parts(pages, chunk_size, workers))
+    with open(output, "wb") as f:
+        f.write(parts[0] if len(parts) == 1 else _merge_pdfs(parts))
+    return len(pages)
+
+
+def _float_list(value: str) -> List[float]:
+    return [float(item) for item in value.split(",") if item.strip()]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render pre-filled quote sheets for a list of customers and VINs.")
+    parser.add_argument("customers", help="CSV with Customer and VIN columns (optional County, Tier, Down).")
+    parser.add_argument("--output", default="quote_packet.pdf", help="Output .pdf or .zip file.")
+    parser.add_argument("--format", choices=("pdf", "zip"),
+                        help="One multi-page PDF or a zip of PDFs; inferred from the output extension by default.")
+    parser.add_argument("--county", default=DEFAULT_COUNTY, help="County for rows without one.")
+    parser.add_argument("--tier", type=int, default=1, help="Credit tier for rows without one.")
+    parser.add_argument("--ladder", type=_float_list, default=list(DEFAULT_LADDER),
+                        help="Comma-separated amounts added to each customer's Down, one row each.")
+    parser.add_argument("--options", type=int, default=DEFAULT_OPTIONS_PER_PAGE,
+                        help="Lowest-payment options per sheet.")
+    parser.add_argument("--mileage", type=int, help="Only quote this annual mileage.")
+    parser.add_argument("--no-markup", action="store_true", help="Quote without the money factor markup.")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count).")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Pages per worker task.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    fmt = args.format or ("zip" if os.path.splitext(args.output)[1].lower() == ".zip" else "pdf")
+    try:
+        pages = build_quote_pages(
+            pd.read_csv(args.customers),
+            county=args.county,
+            tier=args.tier,
+            ladder=args.ladder,
+            options_per_page=args.options,
+            apply_markup=not args.no_markup,
+            mileage=args.mileage,
+        )
+        if not pages:
+            print("❌ No quote sheets to render.")
+            return
+        count = write_packet(pages, args.output, fmt, workers=args.workers, chunk_size=args.chunk_size)
+    except (ValueError, RuntimeError) as e:
+        sys.exit(f"❌ {e}")
+    print(f"✅ Saved {count} quote sheets to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
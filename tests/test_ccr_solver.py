@@ -0,0 +1,115 @@
+"""Equivalence of the single-pass CCR solver with the original two-call pricing path."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_loader import PROGRAMS_FILE, TIER_COLUMNS, _read_lease_programs
+from lease_calculations import (
+    calculate_ccr_full,
+    calculate_payment_from_ccr,
+    calculate_quote_batch,
+    solve_option_quote,
+)
+
+DRAWS_PER_PROGRAM = 10
+SEED = 20240501
+# Payments are whole cents and must match exactly. CCR and trade used are
+# rounded to six decimals through np.round, which can land one step away
+# from Python's round() on the same value.
+MICRO_TOLERANCE = 1.01e-6
+
+
+def reference_option_payment(selling_price, lease_cash_used, residual_value, money_factor, term,
+                             trade_val, cash_down, tax_rt):
+    """The original utils.calculate_option_payment, kept verbatim as the reference."""
+    initial_B = lease_cash_used
+    ccr_initial, _, debug_ccr_initial = calculate_ccr_full(
+        SP=selling_price, B=initial_B, rebates=0.0, TV=0.0, K=0.0, M=962.50, Q=0.0,
+        RES=residual_value, F=money_factor, W=term, τ=tax_rt
+    )
+    overflow = abs(debug_ccr_initial.get("Initial TopVal", 0.0)) if debug_ccr_initial.get("Initial TopVal", 0.0) < 0 else 0
+    trade_used = min(trade_val, overflow)
+    remaining_gap = overflow - trade_used
+    cash_used = min(cash_down, remaining_gap)
+    remaining_trade = trade_val - trade_used
+    remaining_cash = cash_down - cash_used
+    adjusted_SP = selling_price - remaining_trade
+    total_B = initial_B + trade_used + cash_used + remaining_cash
+    ccr, _, _ = calculate_ccr_full(
+        SP=adjusted_SP, B=total_B, rebates=0.0, TV=0.0, K=0.0, M=962.50, Q=0.0,
+        RES=residual_value, F=money_factor, W=term, τ=tax_rt
+    )
+    payment = calculate_payment_from_ccr(
+        S=adjusted_SP, CCR=ccr, RES=residual_value, W=term,
+        F=money_factor, τ=tax_rt, M=962.50, Q=0.0
+    )
+    return {
+        'payment': payment['Monthly Payment (MP)'],
+        'base_payment': payment['Base Payment (BP)'],
+        'tax_payment': payment['Sales Tax (ST)'],
+        'ccr': ccr,
+        'trade_used': trade_used,
+        'remaining_cash': remaining_cash
+    }
+
+
+@pytest.fixture(scope="module")
+def cases() -> pd.DataFrame:
+    """Random quotes for every program row and tier with a money factor.
+
+    A quarter of the draws use no trade and a quarter no cash, so the paths
+    where trade or cash alone fills the topVal gap are covered too.
+    """
+    programs = _read_lease_programs(PROGRAMS_FILE).dropna(subset=["Term", "Residual"])
+    rates = programs[TIER_COLUMNS].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    rng = np.random.default_rng(SEED)
+    rows = []
+    for (_, program), tier_rates in zip(programs.iterrows(), rates):
+        lease_cash = float(pd.to_numeric(program.get("LeaseCash"), errors="coerce") or 0.0)
+        for money_factor in tier_rates[~np.isnan(tier_rates)]:
+            for _ in range(DRAWS_PER_PROGRAM):
+                price = round(float(rng.uniform(18000, 70000)), 2)
+                rows.append({
+                    "SP": price,
+                    "B": round(float(rng.uniform(0, lease_cash)), 2) if lease_cash > 0 else 0.0,
+                    "RES": round(price * float(program["Residual"]), 2),
+                    "F": float(money_factor),
+                    "W": int(program["Term"]),
+                    "trade": 0.0 if rng.random() < 0.25 else round(float(rng.uniform(0, 15000)), 2),
+                    "cash": 0.0 if rng.random() < 0.25 else round(float(rng.uniform(0, 10000)), 2),
+                    "tax": round(float(rng.uniform(0, 0.1)), 4),
+                })
+    frame = pd.DataFrame(rows)
+    frame["expected"] = [
+        reference_option_payment(r.SP, r.B, r.RES, r.F, r.W, r.trade, r.cash, r.tax)
+        for r in frame.itertuples()
+    ]
+    return frame
+
+
+def _assert_matches(expected, actual, case):
+    for name in ("payment", "base_payment", "tax_payment", "remaining_cash"):
+        assert float(actual[name]) == expected[name], (name, case)
+    for name in ("ccr", "trade_used"):
+        assert float(actual[name]) == pytest.approx(expected[name], abs=MICRO_TOLERANCE), (name, case)
+
+
+def test_cases_cover_the_program_database(cases):
+    assert len(cases) > 10_000
+    overflowed = sum(expected["trade_used"] > 0 for expected in cases["expected"])
+    assert 0 < overflowed < len(cases)
+
+
+def test_scalar_solver_matches_reference(cases):
+    for r in cases.itertuples():
+        actual = solve_option_quote(SP=r.SP, B=r.B, RES=r.RES, F=r.F, W=r.W, τ=r.tax, trade=r.trade, cash=r.cash)
+        _assert_matches(r.expected, actual, r)
+
+
+def test_batch_solver_matches_reference(cases):
+    batch = calculate_quote_batch(
+        SP=cases["SP"], B=cases["B"], RES=cases["RES"], F=cases["F"], W=cases["W"],
+        τ=cases["tax"], trade=cases["trade"], cash=cases["cash"],
+    )
+    for i, r in enumerate(cases.itertuples()):
+        _assert_matches(r.expected, {name: values[i] for name, values in batch.items()}, r)
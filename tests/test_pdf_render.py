@@ -0,0 +1,107 @@
+"""Concurrent quote PDF renders on the background pool."""
+import threading
+import time
+
+import pytest
+
+import pdf_utils
+from quote_document import QuotePage, build_quote_document, down_payment_ladder
+from quote_grid import QuoteOption
+
+OPTIONS = [
+    QuoteOption(0, 36, 10000, 20300.0, 58.0, 0.00215, 1500.0, 35000.0),
+    QuoteOption(1, 39, 12000, 19600.0, 56.0, 0.00195, 1500.0, 35000.0),
+]
+VEHICLE = {"year": 2025, "make": "Hyundai", "model": "Tucson", "trim": "SE", "msrp": 35000.0, "vin": "KM8JA3DE0SU000001"}
+
+
+def quote_documents(count):
+    return [
+        build_quote_document(QuotePage(f"Customer {i}", VEHICLE, OPTIONS, 0.07, down_payment_ladder(500.0 * i)))
+        for i in range(count)
+    ]
+
+
+def render_together(docs):
+    pdf_utils.PDF_CACHE.clear()
+    futures = [pdf_utils.submit_quote_pdf(doc) for doc in docs]
+    return [future.result(timeout=60) for future in futures]
+
+
+class FakeHTML:
+    """Stands in for weasyprint.HTML and records how many layouts overlap."""
+
+    lock = threading.Lock()
+    active = 0
+    most_active = 0
+
+    def __init__(self, string, base_url=None):
+        self.string = string
+
+    def write_pdf(self, stylesheets, font_config):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.most_active = max(cls.most_active, cls.active)
+        time.sleep(0.1)
+        with cls.lock:
+            cls.active -= 1
+        return b"%PDF-fake " + self.string.encode()
+
+
+def test_weasyprint_layouts_do_not_overlap(monkeypatch):
+    monkeypatch.setattr(pdf_utils, "_WEASYPRINT_AVAILABLE", True)
+    monkeypatch.setattr(pdf_utils, "HTML", FakeHTML, raising=False)
+    monkeypatch.setattr(pdf_utils, "_weasyprint_renderer", lambda: ("stylesheet", "font config"))
+    docs = quote_documents(pdf_utils.PDF_RENDER_WORKERS)
+
+    pdfs = render_together(docs)
+
+    assert FakeHTML.most_active == 1
+    for doc, pdf in zip(docs, pdfs):
+        assert doc.customer_name.encode() in pdf
+
+
+@pytest.mark.skipif(not pdf_utils._WEASYPRINT_AVAILABLE, reason="WeasyPrint or its system libraries are not installed")
+def test_weasyprint_renders_two_documents_at_once():
+    pdfs = render_together(quote_documents(pdf_utils.PDF_RENDER_WORKERS))
+
+    assert all(pdf.startswith(b"%PDF") for pdf in pdfs)
+    assert pdfs[0] != pdfs[1]
+
+
+def test_reportlab_renders_two_documents_at_once(monkeypatch):
+    monkeypatch.setattr(pdf_utils, "_WEASYPRINT_AVAILABLE", False)
+
+    pdfs = render_together(quote_documents(pdf_utils.PDF_RENDER_WORKERS))
+
+    assert all(pdf.startswith(b"%PDF") for pdf in pdfs)
+    assert pdfs[0] != pdfs[1]
+
+
+def test_shared_render_is_cancelled_only_when_its_last_owner_releases_it(monkeypatch):
+    release_workers = threading.Event()
+    render = pdf_utils.render_quote_documents
+    monkeypatch.setattr(pdf_utils, "render_quote_documents", lambda docs: (release_workers.wait(10), render(docs))[1])
+    monkeypatch.setattr(pdf_utils, "_WEASYPRINT_AVAILABLE", False)
+    pdf_utils.PDF_CACHE.clear()
+    *busy, shared, other = quote_documents(pdf_utils.PDF_RENDER_WORKERS + 2)
+    try:
+        # Occupy every worker so the next renders stay queued.
+        running = [pdf_utils.submit_quote_pdf(doc) for doc in busy]
+        future = pdf_utils.submit_quote_pdf(shared, "session a")
+        assert pdf_utils.submit_quote_pdf(shared, "session b") is future
+        unowned = pdf_utils.submit_quote_pdf(other)
+
+        assert not pdf_utils.release_quote_pdf(future, "session a")
+        assert not future.cancelled()
+        assert pdf_utils.release_quote_pdf(future, "session b")
+        assert future.cancelled()
+        assert not pdf_utils.release_quote_pdf(unowned, "session a")
+
+        # A cancelled render is not reused by the next identical request.
+        again = pdf_utils.submit_quote_pdf(shared, "session a")
+        assert again is not future
+    finally:
+        release_workers.set()
+    assert all(f.result(timeout=60).startswith(b"%PDF") for f in [*running, unowned, again])
@@ -0,0 +1,51 @@
+"""Quote grid caching across data reloads."""
+import math
+
+import pytest
+
+from data_loader import DataStore, lookup_programs, lookup_vehicle, vin_model_year
+from quote_grid import GRID_CACHE, get_quote_grid
+
+TAX_RATE = 0.07
+
+
+def programs_with_blank_tier(snapshot):
+    """Return (vin, msrp, programs) for a vehicle whose programs leave some tier without a rate."""
+    for vin, vehicle in snapshot.vehicle_index.items():
+        programs = lookup_programs(snapshot.program_index, vehicle.model_number, vin_model_year(vin))
+        if vehicle.msrp > 0 and any(math.isnan(mf) for record in programs.values() for mf in record.money_factors):
+            return vin, vehicle.msrp, programs
+    pytest.skip("no inventory vehicle has a tier without a money factor")
+
+
+@pytest.fixture
+def reloaded():
+    store = DataStore()
+    before = store.snapshot()
+    after = store.refresh()
+    assert after.version > before.version
+    GRID_CACHE.clear()
+    return before, after
+
+
+def test_reload_of_unchanged_data_hits_the_cache(reloaded):
+    before, after = reloaded
+    vin, msrp, programs = programs_with_blank_tier(before)
+    reloaded_programs = lookup_programs(after.program_index, lookup_vehicle(after.vehicle_index, vin).model_number,
+                                        vin_model_year(vin))
+    assert reloaded_programs is not programs
+
+    grid = get_quote_grid(vin, programs, msrp, TAX_RATE)
+    assert get_quote_grid(vin, reloaded_programs, msrp, TAX_RATE) is grid
+    assert len(GRID_CACHE) == 1
+
+
+def test_changed_rates_miss_the_cache(reloaded):
+    before, _ = reloaded
+    vin, msrp, programs = programs_with_blank_tier(before)
+    term = min(programs)
+    changed = dict(programs)
+    changed[term] = programs[term]._replace(residual=programs[term].residual - 0.01)
+
+    grid = get_quote_grid(vin, programs, msrp, TAX_RATE)
+    assert get_quote_grid(vin, changed, msrp, TAX_RATE) is not grid
@@ -0,0 +1,238 @@
+"""The inventory scraper against a local HTTP server standing in for the dealer site."""
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from update_locator_inventory import (
+    HostRateLimiter,
+    fetch_vehicle_urls,
+    load_state,
+    main,
+    make_session,
+    scrape_inventory,
+    scrape_vehicle,
+)
+
+PAGE_COUNT = 6
+BROKEN_PATH = "/new/Hyundai/broken/"
+SLOW_PATH = "/new/Hyundai/slow/"
+SLOW_DELAY = 1.0  # seconds the slow page takes to answer
+TIMEOUT = 0.3
+RETRIES = 1
+
+PAGE_TEMPLATE = """<html><body>
+<h1 class="page-title">2025 Hyundai Tucson SE {n}</h1>
+<ul><li class="vin">VIN: KM8JA3DE{n:09d}</li><li class="stockNumber">Stock: H{n:04d}</li></ul>
+<div class="pricing"><span class="label">MSRP</span><span class="value">${msrp:,.0f}</span></div>
+</body></html>"""
+
+
+def page_path(n: int) -> str:
+    return f"/new/Hyundai/tucson-{n}/"
+
+
+class InventorySite(ThreadingHTTPServer):
+    """A sitemap, vehicle pages, a page that always fails and a slow page.
+
+    Paths added to ``failing`` return 500 as well.
+
+    Every request is counted per path with its arrival time, and vehicle
+    pages answer ``If-None-Match`` with a 304 while their ETag is unchanged.
+    """
+
+    daemon_threads = True
+    block_on_close = False
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), InventoryHandler)
+        self.base_url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.pages = {page_path(n): dict(n=n, msrp=30000 + 250 * n, lastmod="2025-05-01", delay=0.0)
+                      for n in range(PAGE_COUNT)}
+        self.sitemap_paths = [*self.pages, "/used/Ford/f-150/", BROKEN_PATH, SLOW_PATH]
+        self.failing = set()
+        self.hits = Counter()
+        self.statuses = Counter()
+        self.arrivals = []
+        self.lock = threading.Lock()
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def sitemap(self) -> bytes:
+        entries = "".join(
+            f"<url><loc>{self.url(path)}</loc><lastmod>{self.pages.get(path, {}).get('lastmod', '')}</lastmod></url>"
+            for path in self.sitemap_paths
+        )
+        return (f'<?xml version="1.0" encoding="UTF-8"?>'
+                f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>').encode()
+
+
+class InventoryHandler(BaseHTTPRequestHandler):
+    server: InventorySite
+
+    def do_GET(self):
+        site = self.server
+        with site.lock:
+            site.hits[self.path] += 1
+            site.arrivals.append((time.monotonic(), self.path))
+        if self.path == "/sitemap.xml":
+            self.reply(200, site.sitemap(), "application/xml")
+        elif self.path == BROKEN_PATH or self.path in site.failing:
+            self.reply(500, b"server error")
+        elif self.path == SLOW_PATH:
+            time.sleep(SLOW_DELAY)
+            self.reply(200, PAGE_TEMPLATE.format(n=99, msrp=1).encode())
+        elif self.path in site.pages:
+            page = site.pages[self.path]
+            time.sleep(page["delay"])
+            etag = f'"{page["n"]}-{page["msrp"]}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.reply(304, b"", etag=etag)
+            else:
+                self.reply(200, PAGE_TEMPLATE.format(**page).encode(), etag=etag)
+        else:
+            self.reply(404, b"not found")
+
+    def reply(self, status, body, content_type="text/html", etag=None):
+        with self.server.lock:
+            self.server.statuses[self.path, status] += 1
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = InventorySite()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def session():
+    with make_session(PAGE_COUNT, RETRIES, backoff=0.0) as session:
+        yield session
+
+
+def page_urls(site):
+    return {site.url(path): page["lastmod"] for path, page in site.pages.items()}
+
+
+def test_sitemap_keeps_order_and_only_new_hyundai_pages(site, session):
+    urls = fetch_vehicle_urls(session, site.url("/sitemap.xml"), HostRateLimiter(0), TIMEOUT)
+    assert list(urls) == [site.url(path) for path in site.sitemap_paths if path != "/used/Ford/f-150/"]
+    assert urls[site.url(page_path(0))] == "2025-05-01"
+    assert urls[site.url(BROKEN_PATH)] == ""
+
+
+def test_records_keep_sitemap_order_and_skip_failed_pages(site, session):
+    # Later pages answer first, so completion order is the reverse of sitemap order.
+    for path, page in site.pages.items():
+        page["delay"] = 0.03 * (PAGE_COUNT - page["n"])
+    urls = fetch_vehicle_urls(session, site.url("/sitemap.xml"), HostRateLimiter(0), TIMEOUT)
+    records, state = scrape_inventory(session, urls, HostRateLimiter(0), TIMEOUT, workers=PAGE_COUNT + 2)
+
+    assert [record["URL"] for record in records] == list(page_urls(site))
+    assert [record["StockNumber"] for record in records] == [f"H{n:04d}" for n in range(PAGE_COUNT)]
+    assert records[1]["MSRP"] == 30250.0
+    assert set(state) == set(page_urls(site))
+
+
+def test_server_errors_are_retried_then_given_up(site, session):
+    assert scrape_vehicle(session, site.url(BROKEN_PATH), HostRateLimiter(0), TIMEOUT) is None
+    assert site.hits[BROKEN_PATH] == RETRIES + 1
+
+
+def test_slow_page_times_out(site, session):
+    started = time.monotonic()
+    assert scrape_vehicle(session, site.url(SLOW_PATH), HostRateLimiter(0), TIMEOUT) is None
+    assert time.monotonic() - started < SLOW_DELAY
+    assert site.hits[SLOW_PATH] == RETRIES + 1
+
+
+def test_requests_to_one_host_are_spaced_by_the_rate(site, session):
+    rate = 20.0
+    scrape_inventory(session, page_urls(site), HostRateLimiter(rate), TIMEOUT, workers=PAGE_COUNT)
+
+    times = sorted(arrival for arrival, _ in site.arrivals)
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert len(times) == PAGE_COUNT
+    # Server-side arrival times carry some scheduling jitter around the client's slots.
+    assert min(gaps) > 0.5 / rate
+    assert times[-1] - times[0] >= 0.9 * (PAGE_COUNT - 1) / rate
+
+
+def test_rate_limit_is_per_host():
+    limiter = HostRateLimiter(5.0)
+    started = time.monotonic()
+    limiter.wait("http://a.example/1")
+    limiter.wait("http://b.example/1")
+    assert time.monotonic() - started < 0.1
+    limiter.wait("http://a.example/2")
+    assert time.monotonic() - started >= 0.19
+
+
+def test_unchanged_lastmod_skips_the_request(site, session):
+    url = site.url(page_path(2))
+    record, cached = scrape_vehicle(session, url, HostRateLimiter(0), TIMEOUT, lastmod="2025-05-01")
+    assert site.hits[page_path(2)] == 1
+
+    again, entry = scrape_vehicle(session, url, HostRateLimiter(0), TIMEOUT, cached, "2025-05-01")
+    assert site.hits[page_path(2)] == 1
+    assert entry is cached
+    assert again == record
+
+
+def test_changed_lastmod_revalidates_with_a_conditional_request(site, session):
+    url = site.url(page_path(3))
+    record, cached = scrape_vehicle(session, url, HostRateLimiter(0), TIMEOUT, lastmod="2025-05-01")
+    assert cached["etag"] == '"3-30750"'
+
+    again, entry = scrape_vehicle(session, url, HostRateLimiter(0), TIMEOUT, cached, "2025-05-02")
+    assert site.statuses[page_path(3), 304] == 1
+    assert again == record
+    assert entry == dict(cached, lastmod="2025-05-02")
+
+    # A price change gives a new ETag, so the page is downloaded and parsed again.
+    site.pages[page_path(3)]["msrp"] = 31000
+    changed, entry = scrape_vehicle(session, url, HostRateLimiter(0), TIMEOUT, entry, "2025-05-03")
+    assert site.statuses[page_path(3), 200] == 2
+    assert changed["MSRP"] == 31000.0
+    assert entry["etag"] == '"3-31000"'
+
+
+def test_incremental_run_keeps_pages_that_fail_to_download(site, tmp_path):
+    paths = dict(output=tmp_path / "locator.xlsx", state=tmp_path / "state.json", changes=tmp_path / "changes.csv")
+    argv = ["--sitemap", site.url("/sitemap.xml"), "--incremental", "--rate", "0",
+            "--timeout", str(TIMEOUT), "--retries", str(RETRIES), "--backoff", "0"]
+    for name, path in paths.items():
+        argv += [f"--{name}", str(path)]
+    main(argv)
+    assert len(pd.read_excel(paths["output"])) == PAGE_COUNT
+
+    # Page 1 changes and then fails; page 4 leaves the sitemap.
+    site.pages[page_path(1)]["lastmod"] = "2025-05-02"
+    site.failing.add(page_path(1))
+    site.sitemap_paths.remove(page_path(4))
+    main(argv)
+
+    workbook = pd.read_excel(paths["output"])
+    assert list(workbook["StockNumber"]) == ["H0000", "H0001", "H0002", "H0003", "H0005"]
+    changes = pd.read_csv(paths["changes"])
+    assert list(changes["Change"]) == ["removed"]
+    assert list(changes["StockNumber"]) == ["H0004"]
+    assert site.url(page_path(1)) in load_state(paths["state"])
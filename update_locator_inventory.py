@@ -1,71 +1,357 @@
+import argparse
+import json
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
 import pandas as pd
 import requests
 from bs4 import BeautifulSoup
-from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from lxml import etree
+    _LXML_AVAILABLE = True
+except ImportError:
+    _LXML_AVAILABLE = False
 
 # Constants
 SITEMAP_URL = "https://www.mathewshyundai.com/sitemap.xml"
 OUTPUT_FILE = "Locator_Detail_Updated.xlsx"
+STATE_FILE = "locator_state.json"
+CHANGES_FILE = "Locator_Changes.csv"
+STATE_VERSION = 1
+USER_AGENT = "Mozilla/5.0"
 
-# Step 1: Parse sitemap
-sitemap_response = requests.get(SITEMAP_URL)
-sitemap_soup = BeautifulSoup(sitemap_response.content, "xml")
-urls = [
-    loc.get_text()
-    for loc in sitemap_soup.find_all("loc")
-    if "/new/" in loc.get_text() and "/Hyundai/" in loc.get_text()
-]
+VEHICLE_COLUMNS = ["VIN", "StockNumber", "Year", "Make", "Model", "Trim", "MSRP", "URL", "ScrapeDate"]
 
-# Step 2: Extract data from each vehicle page
-vehicle_data = []
+DEFAULT_WORKERS = 8
+DEFAULT_RATE = 10.0  # requests per second per host
+DEFAULT_TIMEOUT = 15.0  # seconds, for both connect and read
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5  # seconds; doubles on each retry
+PARSE_CHUNK_SIZE = 16 * 1024
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
 
-for url in urls:
-    try:
-        response = requests.get(url, headers={"User-Agent": "Mozilla/5.0"})
-        soup = BeautifulSoup(response.text, "html.parser")
 
-        # Title: 2025 Hyundai Elantra SEL
-        title_el = soup.select_one("h1.page-title")
-        if not title_el:
+class HostRateLimiter:
+    """Space out requests so each host sees at most ``rate`` requests per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str) -> None:
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def make_session(pool_size: int, retries: int, backoff: float) -> requests.Session:
+    """Return a session whose connection pool can serve ``pool_size`` threads."""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET", "HEAD"),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch(session: requests.Session, url: str, limiter: HostRateLimiter, timeout: float,
+          headers=None, stream=False) -> requests.Response:
+    limiter.wait(url)
+    response = session.get(url, timeout=timeout, headers=headers, stream=stream)
+    response.raise_for_status()
+    return response
+
+
+def iter_sitemap_entries(source):
+    """Yield (loc, lastmod) pairs from a sitemap file object as it is read.
+
+    Each <url> element is discarded once handled, so memory stays flat
+    however large the sitemap is. ``lastmod`` is "" when missing.
+    """
+    for _, element in ET.iterparse(source, events=("end",)):
+        tag = element.tag.rsplit("}", 1)[-1]
+        if tag != "url":
             continue
-        title_parts = title_el.get_text(strip=True).split()
-        year, make, model = title_parts[:3]
-        trim = " ".join(title_parts[3:]) if len(title_parts) > 3 else ""
-
-        # VIN and Stock
-        vin_el = soup.select_one("li.vin")
-        vin = vin_el.get_text(strip=True).replace("VIN:", "").strip() if vin_el else ""
-
-        stock_el = soup.select_one("li.stockNumber")
-        stock = stock_el.get_text(strip=True).replace("Stock:", "").strip() if stock_el else ""
-
-        # MSRP
-        msrp_el = soup.select_one("div.pricing span.value")
-        if msrp_el:
-            msrp_text = msrp_el.get_text(strip=True).replace("$", "").replace(",", "")
-            msrp = float(msrp_text)
-        else:
-            msrp = None
-
-        vehicle_data.append({
-            "VIN": vin,
-            "StockNumber": stock,
-            "Year": year,
-            "Make": make,
-            "Model": model,
-            "Trim": trim,
-            "MSRP": msrp,
-            "URL": url,
-            "ScrapeDate": datetime.today().strftime("%Y-%m-%d")
-        })
+        loc = element.findtext(f"{SITEMAP_NS}loc") or element.findtext("loc") or ""
+        lastmod = element.findtext(f"{SITEMAP_NS}lastmod") or element.findtext("lastmod") or ""
+        element.clear()
+        if loc.strip():
+            yield loc.strip(), lastmod.strip()
+
+
+def fetch_vehicle_urls(session, sitemap_url, limiter, timeout):
+    """Return {url: lastmod} for new Hyundai vehicle pages listed in the sitemap.
+
+    ``lastmod`` is an empty string when the sitemap entry has none.
+    """
+    with fetch(session, sitemap_url, limiter, timeout, stream=True) as sitemap_response:
+        sitemap_response.raw.decode_content = True
+        return {
+            url: lastmod
+            for url, lastmod in iter_sitemap_entries(sitemap_response.raw)
+            if "/new/" in url and "/Hyundai/" in url
+        }
+
+
+def extract_fields_bs4(html: str) -> dict:
+    """Return the raw title, VIN, stock and MSRP texts using a full BeautifulSoup tree."""
+    soup = BeautifulSoup(html, "html.parser")
+    fields = {}
+    for name, selector in (
+        ("title", "h1.page-title"),
+        ("vin", "li.vin"),
+        ("stock", "li.stockNumber"),
+        ("msrp", "div.pricing span.value"),
+    ):
+        element = soup.select_one(selector)
+        if element:
+            fields[name] = element.get_text(strip=True)
+    return fields
+
+
+def _has_class(element, name: str) -> bool:
+    return name in (element.get("class") or "").split()
+
+
+def _stripped_text(element) -> str:
+    # Same result as BeautifulSoup's get_text(strip=True).
+    return "".join(text.strip() for text in element.itertext())
+
+
+def extract_fields_lxml(html: str) -> dict:
+    """Return the same fields as extract_fields_bs4 from an incremental lxml parse.
+
+    The page is fed to the parser in chunks and parsing stops as soon as
+    all four fields have been seen, so the rest of the page is never parsed.
+    """
+    parser = etree.HTMLPullParser(events=("end",), tag=("h1", "li", "span"))
+    fields = {}
+    for start in range(0, len(html), PARSE_CHUNK_SIZE):
+        parser.feed(html[start:start + PARSE_CHUNK_SIZE])
+        for _, element in parser.read_events():
+            if element.tag == "h1" and "title" not in fields and _has_class(element, "page-title"):
+                fields["title"] = _stripped_text(element)
+            elif element.tag == "li" and "vin" not in fields and _has_class(element, "vin"):
+                fields["vin"] = _stripped_text(element)
+            elif element.tag == "li" and "stock" not in fields and _has_class(element, "stockNumber"):
+                fields["stock"] = _stripped_text(element)
+            elif element.tag == "span" and "msrp" not in fields and _has_class(element, "value") and any(
+                ancestor.tag == "div" and _has_class(ancestor, "pricing") for ancestor in element.iterancestors()
+            ):
+                fields["msrp"] = _stripped_text(element)
+        if len(fields) == 4:
+            break
+    return fields
+
+
+FIELD_EXTRACTORS = {"bs4": extract_fields_bs4}
+if _LXML_AVAILABLE:
+    FIELD_EXTRACTORS["lxml"] = extract_fields_lxml
+DEFAULT_PARSER = "lxml" if _LXML_AVAILABLE else "bs4"
+
 
+def parse_vehicle_page(html: str, url: str, parser: str = DEFAULT_PARSER):
+    """Return the inventory record for a vehicle page, or None without a title."""
+    fields = FIELD_EXTRACTORS[parser](html)
+
+    # Title: 2025 Hyundai Elantra SEL
+    if not fields.get("title"):
+        return None
+    title_parts = fields["title"].split()
+    year, make, model = title_parts[:3]
+    trim = " ".join(title_parts[3:]) if len(title_parts) > 3 else ""
+
+    # VIN and Stock
+    vin = fields.get("vin", "").replace("VIN:", "").strip()
+    stock = fields.get("stock", "").replace("Stock:", "").strip()
+
+    # MSRP
+    if "msrp" in fields:
+        msrp = float(fields["msrp"].replace("$", "").replace(",", ""))
+    else:
+        msrp = None
+
+    return {
+        "VIN": vin,
+        "StockNumber": stock,
+        "Year": year,
+        "Make": make,
+        "Model": model,
+        "Trim": trim,
+        "MSRP": msrp,
+        "URL": url,
+        "ScrapeDate": datetime.today().strftime("%Y-%m-%d")
+    }
+
+
+def scrape_vehicle(session, url, limiter, timeout, cached=None, lastmod="", parser=DEFAULT_PARSER):
+    """Return (record, state entry) for a vehicle page, or None on failure.
+
+    With a ``cached`` state entry the page is skipped entirely when the
+    sitemap ``lastmod`` is unchanged, and otherwise requested conditionally
+    so an unchanged page costs a 304 instead of a download and parse.
+    """
+    today = datetime.today().strftime("%Y-%m-%d")
+    if cached and cached.get("record"):
+        if lastmod and lastmod == cached.get("lastmod"):
+            return dict(cached["record"], ScrapeDate=today), cached
+    try:
+        headers = {}
+        if cached and cached.get("record"):
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        response = fetch(session, url, limiter, timeout, headers=headers)
+        if response.status_code == 304:
+            return dict(cached["record"], ScrapeDate=today), dict(cached, lastmod=lastmod)
+        record = parse_vehicle_page(response.text, url, parser)
     except Exception as e:
         print(f"❌ Error parsing {url}: {e}")
+        return None
+    if not record:
+        return None
+    return record, {
+        "etag": response.headers.get("ETag", ""),
+        "last_modified": response.headers.get("Last-Modified", ""),
+        "lastmod": lastmod,
+        "record": record,
+    }
+
+
+def scrape_inventory(session, urls, limiter, timeout, workers, state=None, parser=DEFAULT_PARSER):
+    """Scrape vehicle pages concurrently, keeping sitemap order.
+
+    ``urls`` maps each page to its sitemap lastmod. Returns the records and
+    the new {url: state entry} mapping. A page that fails but has a saved
+    state entry keeps its last good record, so a page still listed in the
+    sitemap is never reported as removed just because it could not be read.
+    """
+    state = state or {}
+
+    def scrape(url):
+        return url, scrape_vehicle(session, url, limiter, timeout, state.get(url), urls[url], parser)
+
+    records, new_state = [], {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for url, result in executor.map(scrape, urls):
+            if not result and state.get(url, {}).get("record"):
+                print(f"⚠️ Keeping the last good record for {url}")
+                result = state[url]["record"], state[url]
+            if result:
+                records.append(result[0])
+                new_state[url] = result[1]
+    return records, new_state
+
+
+def load_state(path):
+    """Return the saved {url: state entry} mapping, or {} if there is none."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if state.get("version") != STATE_VERSION:
+        return {}
+    return state.get("pages", {})
+
+
+def save_state(path, pages) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": STATE_VERSION, "pages": pages}, f)
+    os.replace(tmp_path, path)
+
+
+def inventory_changes(old_records, new_records):
+    """Return added, removed and price-changed vehicles keyed by VIN."""
+    old_by_vin = {record["VIN"]: record for record in old_records if record.get("VIN")}
+    new_by_vin = {record["VIN"]: record for record in new_records if record.get("VIN")}
+    changes = []
+    for vin, record in new_by_vin.items():
+        previous = old_by_vin.get(vin)
+        if previous is None:
+            changes.append(dict(record, Change="added", PreviousMSRP=None))
+        elif previous.get("MSRP") != record.get("MSRP"):
+            changes.append(dict(record, Change="price_changed", PreviousMSRP=previous.get("MSRP")))
+    for vin, record in old_by_vin.items():
+        if vin not in new_by_vin:
+            changes.append(dict(record, Change="removed", PreviousMSRP=record.get("MSRP")))
+    return changes
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape new Hyundai inventory into the locator workbook.")
+    parser.add_argument("--sitemap", default=SITEMAP_URL, help="Sitemap URL to read vehicle pages from.")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="Excel file to write.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent page downloads.")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help="Maximum requests per second per host (0 disables the limit).")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Per-request timeout in seconds.")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="Retries for failed requests.")
+    parser.add_argument("--backoff", type=float, default=DEFAULT_BACKOFF, help="Retry backoff factor in seconds.")
+    parser.add_argument("--parser", choices=sorted(FIELD_EXTRACTORS), default=DEFAULT_PARSER,
+                        help="HTML parser backend for vehicle pages.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reuse unchanged pages from the state file and write a changes file.")
+    parser.add_argument("--state", default=STATE_FILE, help="State file used by --incremental.")
+    parser.add_argument("--changes", default=CHANGES_FILE,
+                        help="CSV of added, removed and price-changed VINs written by --incremental.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    workers = max(1, args.workers)
+    limiter = HostRateLimiter(args.rate)
+
+    state = load_state(args.state) if args.incremental else {}
+
+    with make_session(workers, args.retries, args.backoff) as session:
+        # Step 1: Parse sitemap
+        urls = fetch_vehicle_urls(session, args.sitemap, limiter, args.timeout)
+
+        # Step 2: Extract data from each vehicle page
+        vehicle_data, new_state = scrape_inventory(
+            session, urls, limiter, args.timeout, workers, state, args.parser
+        )
+
+    # Step 3: Export
+    if vehicle_data:
+        df = pd.DataFrame(vehicle_data)
+        df.to_excel(args.output, index=False)
+        print(f"✅ Saved {len(df)} vehicles to {args.output}")
+    else:
+        print("❌ No vehicle data found.")
+
+    if args.incremental:
+        reused = sum(1 for url, entry in new_state.items() if state.get(url, {}).get("record") is entry["record"])
+        changes = inventory_changes([entry["record"] for entry in state.values()], vehicle_data)
+        pd.DataFrame(changes, columns=["Change", *VEHICLE_COLUMNS, "PreviousMSRP"]).to_csv(args.changes, index=False)
+        save_state(args.state, new_state)
+        print(f"🔁 Reused {reused} unchanged pages; {len(changes)} changes written to {args.changes}")
 
-# Step 3: Export
-if vehicle_data:
-    df = pd.DataFrame(vehicle_data)
-    df.to_excel(OUTPUT_FILE, index=False)
-    print(f"✅ Saved {len(df)} vehicles to {OUTPUT_FILE}")
-else:
-    print("❌ No vehicle data found.")
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,188 @@
-from lease_calculations import calculate_ccr_full, calculate_payment_from_ccr
+import threading
+from collections import OrderedDict
+from operator import attrgetter
+
+import numpy as np
+
+from lease_calculations import calculate_quote_batch, solve_cash_down_batch, solve_option_quote
+
+
+PAYMENT_CACHE_SIZE = 4096
+PAYMENT_FIELDS = ('selling_price', 'lease_cash_used', 'residual_value', 'money_factor', 'term')
+payment_fields = attrgetter(*PAYMENT_FIELDS)
+
+
+class LRUCache:
+    """Thread-safe bounded mapping that evicts the least recently used entry."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Shared by every session in the process; keys hold every pricing input.
+PAYMENT_CACHE = LRUCache(PAYMENT_CACHE_SIZE)
+
+
+def _payment_key(selling_price, lease_cash_used, residual_value, money_factor, term,
+                 trade_val, cash_down, tax_rt) -> tuple:
+    return (
+        float(selling_price), float(lease_cash_used), float(residual_value),
+        float(money_factor), int(term), float(trade_val), float(cash_down), float(tax_rt),
+    )
 
 
 def calculate_option_payment(selling_price: float, lease_cash_used: float, residual_value: float,
                              money_factor: float, term: int, trade_val: float,
                              cash_down: float, tax_rt: float) -> dict:
-    """Return payment data for a lease option."""
-    initial_B = lease_cash_used
-    ccr_initial, _, debug_ccr_initial = calculate_ccr_full(
-        SP=selling_price, B=initial_B, rebates=0.0, TV=0.0, K=0.0, M=962.50, Q=0.0,
-        RES=residual_value, F=money_factor, W=term, τ=tax_rt
-    )
-    overflow = abs(debug_ccr_initial.get("Initial TopVal", 0.0)) if debug_ccr_initial.get("Initial TopVal", 0.0) < 0 else 0
-    trade_used = min(trade_val, overflow)
-    remaining_gap = overflow - trade_used
-    cash_used = min(cash_down, remaining_gap)
-    remaining_trade = trade_val - trade_used
-    remaining_cash = cash_down - cash_used
-    adjusted_SP = selling_price - remaining_trade
-    total_B = initial_B + trade_used + cash_used + remaining_cash
-    ccr, _, _ = calculate_ccr_full(
-        SP=adjusted_SP, B=total_B, rebates=0.0, TV=0.0, K=0.0, M=962.50, Q=0.0,
-        RES=residual_value, F=money_factor, W=term, τ=tax_rt
+    """Return payment data for a lease option, memoized in PAYMENT_CACHE."""
+    key = _payment_key(selling_price, lease_cash_used, residual_value, money_factor, term,
+                       trade_val, cash_down, tax_rt)
+    cached = PAYMENT_CACHE.get(key)
+    if cached is None:
+        cached = _calculate_option_payment(selling_price, lease_cash_used, residual_value,
+                                           money_factor, term, trade_val, cash_down, tax_rt)
+        PAYMENT_CACHE.put(key, cached)
+    return dict(cached)
+
+
+def _calculate_option_payment(selling_price, lease_cash_used, residual_value, money_factor,
+                              term, trade_val, cash_down, tax_rt) -> dict:
+    return solve_option_quote(
+        SP=selling_price, B=lease_cash_used, RES=residual_value, F=money_factor,
+        W=term, τ=tax_rt, trade=trade_val, cash=cash_down
     )
-    payment = calculate_payment_from_ccr(
-        S=adjusted_SP, CCR=ccr, RES=residual_value, W=term,
-        F=money_factor, τ=tax_rt, M=962.50, Q=0.0
+
+
+def calculate_option_payments(options, trade_val, cash_down, tax_rt) -> dict:
+    """Return payment data for many lease options in one vectorized pass.
+
+    ``trade_val``, ``cash_down`` and ``tax_rt`` may be scalars or arrays that
+    broadcast against the options, e.g. a column of down payments to price a
+    down payment by option matrix. Each value in the result is an array.
+
+    With scalar trade, cash and tax the results go through PAYMENT_CACHE, so
+    only options that have not been priced yet reach the batch engine.
+    """
+    if not all(np.ndim(v) == 0 for v in (trade_val, cash_down, tax_rt)):
+        return _calculate_option_payments(options, trade_val, cash_down, tax_rt)
+
+    keys = [
+        _payment_key(*payment_fields(opt), trade_val, cash_down, tax_rt)
+        for opt in options
+    ]
+    results = [PAYMENT_CACHE.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        priced = _calculate_option_payments([options[i] for i in missing], trade_val, cash_down, tax_rt)
+        for j, i in enumerate(missing):
+            results[i] = {name: values[j] for name, values in priced.items()}
+            PAYMENT_CACHE.put(keys[i], results[i])
+    names = ('payment', 'base_payment', 'tax_payment', 'ccr', 'trade_used', 'remaining_cash')
+    return {name: np.array([result[name] for result in results], dtype=float) for name in names}
+
+
+def _payment_columns(options) -> np.ndarray:
+    """Return the PAYMENT_FIELDS of ``options`` as float columns, one row per field."""
+    return np.array([payment_fields(opt) for opt in options], dtype=float).reshape(-1, len(PAYMENT_FIELDS)).T
+
+
+def _calculate_option_payments(options, trade_val, cash_down, tax_rt) -> dict:
+    SP, B, RES, F, W = _payment_columns(options)
+    return calculate_quote_batch(
+        SP=SP, B=B, RES=RES, F=F, W=W, τ=tax_rt, trade=trade_val, cash=cash_down
     )
-    return {
-        'payment': payment['Monthly Payment (MP)'],
-        'base_payment': payment['Base Payment (BP)'],
-        'tax_payment': payment['Sales Tax (ST)'],
-        'ccr': ccr,
-        'trade_used': trade_used,
-        'remaining_cash': remaining_cash
-    }
+
+
+def _bisect_cents(payment_at, lo, hi, target, decreasing):
+    """Vectorized bisection over whole cents for a monotone payment function.
+
+    Returns the smallest value in [lo, hi] whose payment is at or below
+    ``target`` when payments fall as the value grows, or the largest such
+    value when they rise. NaN marks options that cannot reach the target.
+    """
+    lo = np.round(np.asarray(lo, dtype=float) * 100)
+    hi = np.round(np.asarray(hi, dtype=float) * 100)
+    reachable = payment_at((hi if decreasing else lo) / 100) <= target
+    done = payment_at((lo if decreasing else hi) / 100) <= target
+    while np.any(hi - lo > 1):
+        mid = np.floor((lo + hi) / 2)
+        ok = payment_at(mid / 100) <= target
+        if decreasing:
+            hi, lo = np.where(ok, mid, hi), np.where(ok, lo, mid)
+        else:
+            lo, hi = np.where(ok, mid, lo), np.where(ok, hi, mid)
+    answer = np.where(done, lo if decreasing else hi, hi if decreasing else lo)
+    return np.where(reachable, answer / 100, np.nan)
+
+
+def solve_for_target_payment(options, target_payment, trade_val, cash_down, tax_rt,
+                             solve_for='cash_down') -> np.ndarray:
+    """Return, per option, the value of ``solve_for`` that hits ``target_payment``.
+
+    ``solve_for`` is one of:
+
+    - ``'cash_down'``: the smallest cash down, replacing ``cash_down``.
+      Solved in closed form.
+    - ``'trade'``: the smallest trade value up to the selling price,
+      replacing ``trade_val``. Found by bisection.
+    - ``'selling_price'``: the highest selling price up to twice the
+      current one. Found by bisection.
+
+    Every option is solved in the same vectorized pass. Values are whole
+    cents, and NaN marks options that cannot reach the target.
+    """
+    SP, B, RES, F, W = _payment_columns(options)
+    if solve_for == 'cash_down':
+        return solve_cash_down_batch(SP, B, RES, F, W, tax_rt, trade_val, target_payment)
+    if solve_for == 'trade':
+        return _bisect_cents(
+            lambda trade: calculate_quote_batch(SP, B, RES, F, W, tax_rt, trade, cash_down)['payment'],
+            np.zeros_like(SP), SP, target_payment, decreasing=True,
+        )
+    if solve_for == 'selling_price':
+        return _bisect_cents(
+            lambda price: calculate_quote_batch(price, B, RES, F, W, tax_rt, trade_val, cash_down)['payment'],
+            np.zeros_like(SP), SP * 2, target_payment, decreasing=False,
+        )
+    raise ValueError(f"Unknown solve_for: {solve_for!r}")
 
 
 def sort_quote_options(options, sort_by, trade_value, cash_down, tax_rate):
@@ -46,13 +195,12 @@ def sort_quote_options(options, sort_by, trade_value, cash_down, tax_rate):
     }
 
     if sort_by == "Most Lease Cash Available":
-        options.sort(key=lambda x: x['available_lease_cash'], reverse=True)
+        options.sort(key=attrgetter('available_lease_cash'), reverse=True)
     elif sort_by == "Lowest Payment":
-        options.sort(key=lambda x: calculate_option_payment(
-            x['selling_price'], x['lease_cash_used'], x['residual_value'],
-            x['money_factor'], x['term'], trade_value, cash_down, tax_rate
-        )['payment'])
+        payments = calculate_option_payments(options, trade_value, cash_down, tax_rate)['payment']
+        order = np.argsort(payments, kind='stable')
+        options[:] = [options[i] for i in order]
     else:
-        options.sort(key=lambda x: x[sort_options[sort_by]])
+        options.sort(key=attrgetter(sort_options[sort_by]))
 
     return options
@@ -0,0 +1,112 @@
+"""Prepare phone photos of VIN labels for barcode and OCR decoding.
+
+Decode time is dominated by pixel count, so photos are reduced to
+``TARGET_WIDTH`` (JPEGs are decoded at reduced scale directly), turned
+upright and grayscale, and the label area is located from its edge density
+so OCR only sees the part of the frame that holds text or a barcode.
+"""
+import math
+from io import BytesIO
+from typing import NamedTuple, Tuple, Union
+
+import numpy as np
+from PIL import ExifTags, Image, ImageOps
+
+TARGET_WIDTH = 1280
+THRESHOLD_BLOCK = 31  # pixels per side of the local mean window
+THRESHOLD_OFFSET = 10  # gray levels below the local mean that count as ink
+REGION_MIN_ENERGY = 0.15  # fraction of the busiest row/column kept in the region
+REGION_GAP = 0.05  # gaps shorter than this fraction of the image join two runs
+REGION_PADDING = 0.05  # fraction of the image added around the region
+
+
+class PreparedImage(NamedTuple):
+    """A photo reduced for decoding and the label region found in it."""
+    gray: Image.Image                    # upright, grayscale, at most TARGET_WIDTH wide
+    region: Tuple[int, int, int, int]    # (left, top, right, bottom) of the label in ``gray``
+    scale: float                         # ``gray`` size relative to the original photo
+
+    def crop(self) -> Image.Image:
+        return self.gray.crop(self.region)
+
+    def binary(self) -> Image.Image:
+        """The label region after adaptive thresholding, black text on white."""
+        ink = adaptive_threshold(np.asarray(self.crop()))
+        return Image.fromarray(np.where(ink, 0, 255).astype(np.uint8))
+
+
+def load_image(source: Union[bytes, Image.Image], width: int = TARGET_WIDTH) -> Tuple[Image.Image, float]:
+    """Return the photo upright, grayscale and at most ``width`` wide, with the scale applied."""
+    image = Image.open(BytesIO(source)) if isinstance(source, bytes) else source
+    original_width = image.width
+    orientation = image.getexif().get(ExifTags.Base.Orientation, 1)
+    if orientation in (5, 6, 7, 8):
+        original_width = image.height
+    scale = min(1.0, width / original_width)
+    if scale < 1.0 and image.format == "JPEG":
+        # Let the JPEG decoder skip detail we are about to throw away.
+        image.draft("L", (math.ceil(image.width * scale), math.ceil(image.height * scale)))
+    image = ImageOps.exif_transpose(image).convert("L")
+    if image.width > width:
+        image = image.resize((width, round(image.height * width / image.width)), Image.Resampling.BILINEAR)
+    return image, image.width / original_width
+
+
+def adaptive_threshold(gray: np.ndarray, block: int = THRESHOLD_BLOCK, offset: int = THRESHOLD_OFFSET) -> np.ndarray:
+    """Return a boolean ink mask: pixels darker than their local mean by ``offset``."""
+    pixels = gray.astype(np.float64)
+    half = block // 2
+    padded = np.pad(pixels, half + 1, mode="edge")
+    integral = padded.cumsum(0).cumsum(1)
+    h, w = pixels.shape
+    window_sum = (
+        integral[block:block + h, block:block + w]
+        - integral[:h, block:block + w]
+        - integral[block:block + h, :w]
+        + integral[:h, :w]
+    )
+    return pixels < window_sum / (block * block) - offset
+
+
+def _dense_span(profile: np.ndarray) -> Tuple[int, int]:
+    """Return the span of a profile holding the most edge energy above the background.
+
+    The profile is smoothed and its median (background texture) removed, runs
+    above REGION_MIN_ENERGY of the peak separated by less than REGION_GAP are
+    merged (bars of a barcode, lines of text), and the strongest run wins.
+    """
+    n = len(profile)
+    window = max(1, n // 50)
+    smooth = np.convolve(profile, np.ones(window) / window, mode="same")
+    smooth = smooth - np.median(smooth)
+    if smooth.max() <= 0:
+        return 0, n
+    above = np.concatenate(([0], (smooth >= smooth.max() * REGION_MIN_ENERGY).astype(np.int8), [0]))
+    bounds = np.flatnonzero(np.diff(above))
+    starts, ends = list(bounds[::2]), list(bounds[1::2])
+    merged = [[starts[0], ends[0]]]
+    for start, end in zip(starts[1:], ends[1:]):
+        if start - merged[-1][1] < n * REGION_GAP:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    start, end = max(merged, key=lambda span: smooth[span[0]:span[1]].sum())
+    return int(start), int(end)
+
+
+def find_label_region(gray: np.ndarray) -> Tuple[int, int, int, int]:
+    """Locate the band of the image with the most horizontal edges (barcode bars and text)."""
+    h, w = gray.shape
+    edges = np.abs(np.diff(gray.astype(np.int16), axis=1))
+    if not edges.any():
+        return 0, 0, w, h
+    top, bottom = _dense_span(edges.sum(axis=1))
+    left, right = _dense_span(edges[top:bottom].sum(axis=0))
+    pad_x, pad_y = round(w * REGION_PADDING), round(h * REGION_PADDING)
+    return max(0, left - pad_x), max(0, top - pad_y), min(w, right + pad_x), min(h, bottom + pad_y)
+
+
+def prepare_image(source: Union[bytes, Image.Image], width: int = TARGET_WIDTH) -> PreparedImage:
+    """Run the full preprocessing pipeline on encoded image bytes or a PIL image."""
+    gray, scale = load_image(source, width)
+    return PreparedImage(gray=gray, region=find_label_region(np.asarray(gray)), scale=scale)
@@ -0,0 +1,369 @@
+"""VIN recognition shared by the quote app and the VIN scanner page.
+
+Photos go through vin_preprocessing first and then a cascade of decoders,
+cheapest first: barcode on the reduced frame, barcode at full resolution,
+then OCR of the label region. The cascade stops at the first VIN whose check
+digit is valid. Recognition runs on a small per-process worker pool so it
+never blocks a Streamlit script run. EasyOCR readers are created once and reused by the workers, and
+results are cached by a hash of the image bytes so reruns with the same photo
+are free.
+"""
+import hashlib
+import logging
+import queue
+import re
+import threading
+import time
+from collections.abc import Container
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import combinations, product
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+import pytesseract
+from PIL import Image
+
+from utils import LRUCache
+from vin_preprocessing import PreparedImage, load_image, prepare_image
+
+logger = logging.getLogger(__name__)
+
+VIN_PATTERN = re.compile(r"^[A-HJ-NPR-Z0-9]{17}$")
+# OCR output may contain I, O and Q, which never appear in a VIN.
+VIN_READ_PATTERN = re.compile(r"^[A-Z0-9]{17}$")
+VIN_TEXT_PATTERN = re.compile(r"\b[A-Z0-9]{17}\b")
+# ISO 3779 / 49 CFR 565 check digit (position 9) weights and letter values.
+VIN_WEIGHTS = (8, 7, 6, 5, 4, 3, 2, 10, 0, 9, 8, 7, 6, 5, 4, 3, 2)
+VIN_VALUES = {
+    **{str(digit): digit for digit in range(10)},
+    "A": 1, "B": 2, "C": 3, "D": 4, "E": 5, "F": 6, "G": 7, "H": 8,
+    "J": 1, "K": 2, "L": 3, "M": 4, "N": 5, "P": 7, "R": 9,
+    "S": 2, "T": 3, "U": 4, "V": 5, "W": 6, "X": 7, "Y": 8, "Z": 9,
+}
+# Characters OCR mistakes for one another; the first option for I, O and Q is forced.
+VIN_CONFUSIONS = {
+    "O": "0D", "Q": "0", "I": "1L",
+    "0": "D", "D": "0", "1": "L", "L": "1", "8": "B", "B": "8",
+    "5": "S", "S": "5", "2": "Z", "Z": "2", "6": "G", "G": "6", "U": "V", "V": "U",
+}
+# The check digit and the last four serial characters are always numeric.
+VIN_NUMERIC_POSITIONS = (8, 13, 14, 15, 16)
+MAX_VIN_SUBSTITUTIONS = 3
+CASCADE_STAGES = ("barcode_small", "barcode_full", "ocr")
+OCR_ENGINES = ("tesseract", "easyocr")
+DEFAULT_OCR_ENGINE = "tesseract"
+# Worker threads (and EasyOCR readers) per process, and jobs allowed to wait for them.
+OCR_WORKERS = 2
+OCR_QUEUE_SIZE = 4
+VIN_CACHE_SIZE = 256
+
+# (engine, image sha256) -> VIN or None; shared by every session in the process.
+VIN_CACHE = LRUCache(VIN_CACHE_SIZE)
+_MISSING = object()
+
+
+class RecognizerBusy(RuntimeError):
+    """Raised when the OCR queue is full."""
+
+
+class VinDetection(NamedTuple):
+    """Result of the decode cascade for one image."""
+    vin: Optional[str]
+    valid: bool               # the check digit matches
+    stage: Optional[str]      # cascade stage that read ``vin``
+
+
+class StageStats:
+    """Thread-safe call, hit and time totals for each cascade stage."""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float, hit: bool) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(stage, {'calls': 0, 'hits': 0, 'seconds': 0.0})
+            stats['calls'] += 1
+            stats['hits'] += int(hit)
+            stats['seconds'] += seconds
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def info(self) -> dict:
+        with self._lock:
+            return {
+                stage: {**stats, 'mean_ms': stats['seconds'] * 1000 / stats['calls']}
+                for stage, stats in self._stats.items()
+            }
+
+
+STAGE_STATS = StageStats()
+
+
+class ReaderPool:
+    """Hand out warm EasyOCR readers, one caller at a time, creating at most ``size``."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _create(self):
+        import easyocr
+
+        return easyocr.Reader(["en"], gpu=False)
+
+    @contextmanager
+    def reader(self):
+        try:
+            reader = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    reader = self._create()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                reader = self._idle.get()
+        try:
+            yield reader
+        finally:
+            self._idle.put(reader)
+
+    def prewarm(self) -> None:
+        """Create one reader now so the first scan does not pay the model load."""
+        with self.reader():
+            pass
+
+
+READER_POOL = ReaderPool(OCR_WORKERS)
+
+_ocr_pool = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="vin-ocr")
+_ocr_slots = threading.BoundedSemaphore(OCR_WORKERS + OCR_QUEUE_SIZE)
+_pending = {}
+_pending_lock = threading.RLock()
+_prewarm_started = False
+
+
+def image_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def vin_check_digit(vin: str) -> str:
+    """Return the check digit (position 9) a 17-character VIN should carry."""
+    remainder = sum(VIN_VALUES[char] * weight for char, weight in zip(vin, VIN_WEIGHTS)) % 11
+    return "X" if remainder == 10 else str(remainder)
+
+
+def is_valid_vin(vin: str) -> bool:
+    """Return True for a well-formed VIN whose check digit matches."""
+    return bool(VIN_PATTERN.match(vin)) and vin[8] == vin_check_digit(vin)
+
+
+def vin_variants(text: str, max_substitutions: int = MAX_VIN_SUBSTITUTIONS) -> Iterator[str]:
+    """Yield the VINs a 17-character reading could stand for, fewest substitutions first.
+
+    I, O and Q are always replaced and letters in numeric positions mapped
+    to digits; up to ``max_substitutions`` further characters are swapped for
+    their VIN_CONFUSIONS look-alikes.
+    """
+    if len(text) != 17:
+        return
+    choices = []
+    for position, char in enumerate(text.upper()):
+        options = ([char] if char in VIN_VALUES else []) + list(VIN_CONFUSIONS.get(char, ""))
+        if position in VIN_NUMERIC_POSITIONS:
+            options = [option for option in options if option.isdigit() or (position == 8 and option == "X")]
+        if not options:
+            return
+        choices.append(options)
+    base = [options[0] for options in choices]
+    ambiguous = [position for position, options in enumerate(choices) if len(options) > 1]
+    for count in range(min(max_substitutions, len(ambiguous)) + 1):
+        for positions in combinations(ambiguous, count):
+            for picks in product(*(choices[position][1:] for position in positions)):
+                variant = base.copy()
+                for position, pick in zip(positions, picks):
+                    variant[position] = pick
+                yield "".join(variant)
+
+
+def resolve_vin(text: str, known_vins: Container[str] = ()) -> Optional[str]:
+    """Return the VIN an OCR reading most likely stands for.
+
+    Variants are tried fewest substitutions first: the first one in
+    ``known_vins`` (e.g. the inventory index) wins, otherwise the first with a
+    valid check digit. Returns None when neither exists.
+    """
+    fallback = None
+    for variant in vin_variants(text):
+        if variant in known_vins:
+            return variant
+        if fallback is None and is_valid_vin(variant):
+            fallback = variant
+    return fallback
+
+
+def vin_candidates(texts: Iterable[str]) -> Iterator[str]:
+    """Yield every VIN-shaped string in decoder output, in order, with I, O and Q replaced."""
+    for text in texts:
+        text = text.upper()
+        candidate = text.strip().replace(" ", "").replace("-", "")
+        reads = [candidate] if VIN_READ_PATTERN.match(candidate) else VIN_TEXT_PATTERN.findall(text)
+        for read in reads:
+            yield from vin_variants(read, max_substitutions=0)
+
+
+def find_vin(texts: Iterable[str]) -> Optional[str]:
+    """Return the first check-digit-valid VIN in decoder output, else the first VIN-shaped string."""
+    first = None
+    for candidate in vin_candidates(texts):
+        if is_valid_vin(candidate):
+            return candidate
+        first = first or candidate
+    return first
+
+
+def _barcode_decoder():
+    try:
+        from pyzbar.pyzbar import decode
+    except ImportError:  # pyzbar or the zbar library is missing
+        return None
+    return decode
+
+
+def barcode_values(image: Image.Image) -> List[str]:
+    """Return the text of every barcode in ``image``; empty when pyzbar is not installed."""
+    decode = _barcode_decoder()
+    if decode is None:
+        return []
+    return [barcode.data.decode("utf-8", "replace") for barcode in decode(image)]
+
+
+def decode_barcode(image: Image.Image) -> Optional[str]:
+    """Return a VIN from a barcode in ``image`` if found."""
+    return find_vin(barcode_values(image))
+
+
+def ocr_texts(prepared: PreparedImage, engine: str = DEFAULT_OCR_ENGINE) -> List[str]:
+    """Run OCR on the label region of a prepared photo and return the recognized text fragments."""
+    if engine == "tesseract":
+        return [pytesseract.image_to_string(prepared.binary())]
+    if engine == "easyocr":
+        with READER_POOL.reader() as reader:
+            return [text for _, text, _ in reader.readtext(np.asarray(prepared.crop()))]
+    raise ValueError(f"Unknown OCR engine: {engine!r}")
+
+
+def detect_vin(data: bytes, engine: str = DEFAULT_OCR_ENGINE) -> VinDetection:
+    """Run the decode cascade on an encoded image, stopping at the first valid VIN.
+
+    When no stage reads a VIN with a valid check digit, the first VIN-shaped
+    read is returned with ``valid`` False. Each stage's time is recorded in
+    STAGE_STATS.
+    """
+    prepared = prepare_image(data)
+    stages = []
+    if _barcode_decoder() is not None:
+        stages.append(("barcode_small", lambda: barcode_values(prepared.gray)))
+        if prepared.scale < 1.0:
+            stages.append(("barcode_full", lambda: barcode_values(load_image(data, width=2 ** 31)[0])))
+    stages.append(("ocr", lambda: ocr_texts(prepared, engine)))
+
+    fallback = VinDetection(None, False, None)
+    for stage, read in stages:
+        start = time.perf_counter()
+        vin = find_vin(read())
+        valid = vin is not None and is_valid_vin(vin)
+        STAGE_STATS.record(stage, time.perf_counter() - start, valid)
+        if valid:
+            return VinDetection(vin, True, stage)
+        if vin and fallback.vin is None:
+            fallback = VinDetection(vin, False, stage)
+    return fallback
+
+
+def _recognize(data: bytes, engine: str) -> Optional[str]:
+    return detect_vin(data, engine).vin
+
+
+def recognize_vin(data: bytes, engine: str = DEFAULT_OCR_ENGINE) -> Optional[str]:
+    """Return the VIN in an encoded image, blocking until recognition finishes."""
+    return submit_vin_recognition(data, engine, block=True).result()
+
+
+def submit_vin_recognition(data: bytes, engine: str = DEFAULT_OCR_ENGINE, block: bool = False) -> Future:
+    """Queue recognition of an encoded image and return a Future resolving to the VIN or None.
+
+    Cached images resolve immediately and identical images already queued
+    share one job. Raises RecognizerBusy when the queue is full unless
+    ``block`` is set.
+    """
+    key = (engine, image_digest(data))
+    future = _existing_job(key)
+    if future is not None:
+        return future
+    if not _ocr_slots.acquire(blocking=block):
+        raise RecognizerBusy("VIN reader is busy")
+    with _pending_lock:
+        future = _existing_job(key)
+        if future is None:
+            future = _ocr_pool.submit(_recognize_and_cache, key, data, engine)
+            _pending[key] = future
+            return future
+    _ocr_slots.release()
+    return future
+
+
+def _existing_job(key) -> Optional[Future]:
+    with _pending_lock:
+        future = _pending.get(key)
+        if future is not None:
+            return future
+        vin = VIN_CACHE.get(key, _MISSING)
+        if vin is _MISSING:
+            return None
+        future = Future()
+        future.set_result(vin)
+        return future
+
+
+def _recognize_and_cache(key, data, engine):
+    try:
+        vin = _recognize(data, engine)
+        VIN_CACHE.put(key, vin)
+        return vin
+    except Exception as e:
+        logger.warning("VIN recognition failed: %s", e)
+        return None
+    finally:
+        with _pending_lock:
+            _pending.pop(key, None)
+        _ocr_slots.release()
+
+
+def prewarm_ocr(engine: str = DEFAULT_OCR_ENGINE) -> None:
+    """Load the OCR model in a background thread; only the first call does anything."""
+    global _prewarm_started
+    with _pending_lock:
+        if _prewarm_started or engine != "easyocr":
+            return
+        _prewarm_started = True
+
+    def warm():
+        try:
+            READER_POOL.prewarm()
+        except Exception as e:
+            logger.warning("Failed to prewarm EasyOCR: %s", e)
+
+    threading.Thread(target=warm, name="ocr-prewarm", daemon=True).start()